@@ -0,0 +1,5 @@
+# Author: Proloy Das <proloy@umd.edu>
+"""Benchmarks for the DstRF fitting pipeline on synthetic data
+
+Run with ``python -m benchmarks --help``.
+"""
@@ -0,0 +1,243 @@
+# Author: Proloy Das <proloy@umd.edu>
+"""Timing and peak-memory benchmarks of the DstRF fitting pipeline
+
+Examples
+--------
+Run the default sweep and store the results as a baseline::
+
+    $ python -m benchmarks --save baseline.json
+
+Later, check for regressions against that baseline::
+
+    $ python -m benchmarks --compare baseline.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from dstrf import DstRF, Fasta
+from dstrf._model import covariate_from_stim, orientation, _Penalty
+
+from .synthetic import make_problem
+
+
+# problem size all sweeps start from
+BASE = dict(n_sensors=50, n_sources=100, n_times=2000, n_trials=2, orientation='fixed')
+# each dimension is varied separately
+SWEEPS = {
+    'n_sensors': (50, 150),
+    'n_sources': (100, 300),
+    'n_times': (2000, 6000),
+    'n_trials': (2, 6),
+    'orientation': ('fixed', 'free'),
+}
+FIT_ITERATIONS = dict(n_iter=2, n_iterc=2, n_iterf=10)
+MU = 0.01
+# maximum time (s) for ``import dstrf``, with headroom over the about 0.5 s a fresh import takes
+IMPORT_BUDGET = 1.5
+# modules that ``import dstrf`` should not pull in
+HEAVY_MODULES = ('eelbrain', 'mne', 'matplotlib')
+IMPORT_CODE = """
+import sys, time
+t0 = time.perf_counter()
+import dstrf
+print(time.perf_counter() - t0)
+print(' '.join(name for name in %r if name in sys.modules))
+""" % (HEAVY_MODULES,)
+
+
+def _model(lead_field, noise_covariance, data):
+    model = DstRF(lead_field, noise_covariance, **FIT_ITERATIONS)
+    model._set_mu(MU, data)
+    return model
+
+
+def _prox(model):
+    penalty = _Penalty(MU, orientation[model.orientation])
+    return penalty.g, penalty.prox
+
+
+# Every benchmark takes a problem and returns a function that runs the benchmarked step once
+def bench_covariate_from_stim(lead_field, noise_covariance, data):
+    from eelbrain import NDVar, UTS
+    n_times = max(E.shape[0] for E in data.covariates.values()) + data.filter_length - 1
+    stim = NDVar(np.random.randn(n_times), (UTS(0, data.tstep, n_times),))
+    return lambda: covariate_from_stim(stim, data.filter_length)
+
+
+def bench_precompute(lead_field, noise_covariance, data):
+    return data._precompute
+
+
+def bench_construct_f(lead_field, noise_covariance, data):
+    model = _model(lead_field, noise_covariance, data)
+
+    def construct_f():
+        # without the cached factors and whitened lead-fields of the previous run
+        model.__dict__.pop('_factor_cache', None)
+        model.__dict__.pop('_buffers', None)
+        return model._construct_f(data)
+    return construct_f
+
+
+def bench_fasta(lead_field, noise_covariance, data):
+    model = _model(lead_field, noise_covariance, data)
+    funct, grad_funct = model._construct_f(data)
+    g_funct, prox_g = _prox(model)
+    return lambda: Fasta(funct, g_funct, grad_funct, prox_g, n_iter=model.n_iterf).learn(model.theta)
+
+
+def bench_solve(lead_field, noise_covariance, data):
+    model = _model(lead_field, noise_covariance, data)
+    theta = np.random.RandomState(0).randn(*model.theta.shape) * 1e-2
+    return lambda: model._solve(data, theta)
+
+
+def bench_fit(lead_field, noise_covariance, data):
+    model = DstRF(lead_field, noise_covariance, **FIT_ITERATIONS)
+    return lambda: model.fit(data, MU, tol=0)
+
+
+BENCHMARKS = {
+    'covariate_from_stim': bench_covariate_from_stim,
+    'precompute': bench_precompute,
+    'construct_f': bench_construct_f,
+    'fasta': bench_fasta,
+    'solve': bench_solve,
+    'fit': bench_fit,
+}
+
+
+def measure(func, repeat=3):
+    """Best time out of ``repeat`` runs, and peak memory allocated during one run
+
+    Returns
+    -------
+    dict
+    ``{'time': seconds, 'peak': bytes}``
+    """
+    times = []
+    for _ in range(repeat):
+        np.random.seed(0)
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    np.random.seed(0)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'time': min(times), 'peak': peak}
+
+
+def measure_import(repeat=3):
+    """Time ``import dstrf`` takes in a fresh interpreter
+
+    Returns
+    -------
+    time: float
+        best time out of ``repeat`` imports (s)
+    heavy_modules: list of str
+        modules from :data:`HEAVY_MODULES` that were imported along with dstrf
+    """
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', IMPORT_CODE], stdout=subprocess.PIPE,
+                             check=True, universal_newlines=True).stdout.split('\n')
+        times.append(float(out[0]))
+    return min(times), out[1].split()
+
+
+def configurations():
+    "Problem sizes of the sweep as (label, parameters) tuples"
+    seen = set()
+    for dim, values in SWEEPS.items():
+        for value in values:
+            params = dict(BASE, **{dim: value})
+            label = ','.join('%s=%s' % item for item in sorted(params.items()))
+            if label not in seen:
+                seen.add(label)
+                yield label, params
+
+
+def run(benchmarks, repeat=3, filter_length=200):
+    results = {}
+    for label, params in configurations():
+        problem = make_problem(filter_length=filter_length, **params)
+        for name in benchmarks:
+            func = BENCHMARKS[name](*problem[:3])
+            result = measure(func, repeat)
+            results.setdefault(name, {})[label] = result
+            print('%-20s %-80s %8.3f s %8.1f MB' % (name, label, result['time'], result['peak'] / 1e6))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """List benchmarks that are slower or use more memory than the baseline
+
+    Returns
+    -------
+    list of str
+    description of every regression
+    """
+    regressions = []
+    for name, configs in results.items():
+        for label, result in configs.items():
+            if label not in baseline.get(name, {}):
+                continue
+            reference = baseline[name][label]
+            for key in ('time', 'peak'):
+                if key in result and result[key] > reference[key] * (1 + tolerance):
+                    regressions.append('%s %s [%s]: %.4g > %.4g' % (name, key, label, result[key],
+                                                                     reference[key]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.split('\n')[0])
+    parser.add_argument('benchmarks', nargs='*',
+                        help="benchmarks to run, out of %s (default: all)" % ', '.join(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3, help="runs per timing (best is kept)")
+    parser.add_argument('--filter-length', type=int, default=200, help="TRF length in time bins")
+    parser.add_argument('--save', metavar='FILE', help="store results as JSON baseline")
+    parser.add_argument('--compare', metavar='FILE', help="compare results to a JSON baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="relative slow-down/ memory increase counted as regression")
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET,
+                        help="maximum time for importing dstrf (s)")
+    args = parser.parse_args(argv)
+    unknown = set(args.benchmarks).difference(BENCHMARKS)
+    if unknown:
+        parser.error("unknown benchmark: %s" % ', '.join(sorted(unknown)))
+
+    failures = []
+    import_time, heavy_modules = measure_import(args.repeat)
+    print('%-20s %-80s %8.3f s' % ('import', ', '.join(heavy_modules), import_time))
+    if import_time > args.import_budget:
+        failures.append('import dstrf takes %.3f s (budget %.3f s)' % (import_time, args.import_budget))
+    if heavy_modules:
+        failures.append('import dstrf imports %s' % ', '.join(heavy_modules))
+
+    results = run(args.benchmarks or list(BENCHMARKS), args.repeat, args.filter_length)
+    results['import'] = {'import': {'time': import_time}}
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        failures.extend(compare(results, baseline, args.tolerance))
+    for failure in failures:
+        print('REGRESSION: ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
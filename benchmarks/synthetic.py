@@ -0,0 +1,132 @@
+# Author: Proloy Das <proloy@umd.edu>
+"""Synthetic data for benchmarking DstRF"""
+import numpy as np
+from eelbrain import NDVar, Case, Scalar, Sensor, Space, UTS
+
+from dstrf import REG_Data
+from dstrf._model import covariate_from_stim
+
+
+def make_lead_field(n_sensors, n_sources, orientation='fixed', seed=0):
+    """Random lead-field matrix
+
+    Parameters
+    ----------
+    n_sensors: int
+        number of sensors, K
+    n_sources: int
+        number of sources, N
+    orientation: 'fixed' | 'free'
+        source orientation model
+    seed: int
+        seed for the random number generator
+
+    Returns
+    -------
+    NDVar
+    lead-field of shape (K, N) or (K, N, 3)
+    """
+    rng = np.random.RandomState(seed)
+    sensor = Sensor(rng.randn(n_sensors, 3), [str(i) for i in range(n_sensors)])
+    source = Scalar('source', np.arange(n_sources))
+    if orientation == 'fixed':
+        return NDVar(rng.randn(n_sensors, n_sources), (sensor, source))
+    elif orientation == 'free':
+        return NDVar(rng.randn(n_sensors, n_sources, 3), (sensor, source, Space('RAS')))
+    raise ValueError("orientation=%r" % (orientation,))
+
+
+def make_theta(n_sources, n_atoms, orientation='fixed', n_active=5, n_predictors=1, seed=0):
+    """Sparse ground-truth TRF coefficients with respect to the Gabor basis
+
+    Returns
+    -------
+    ndarray
+    array of shape (n_sources * dc, n_predictors * n_atoms) with ``n_active`` non-zero sources
+    """
+    rng = np.random.RandomState(seed)
+    dc = 1 if orientation == 'fixed' else 3
+    theta = np.zeros((n_sources, dc, n_predictors * n_atoms))
+    active = rng.choice(n_sources, min(n_active, n_sources), replace=False)
+    for i in active:
+        # a few neighbouring atoms make a smooth response
+        atoms = rng.choice(n_atoms, min(3, n_atoms), replace=False)
+        for p in range(n_predictors):
+            theta[i, :, p * n_atoms + atoms] = rng.randn(len(atoms), dc)
+    return theta.reshape(n_sources * dc, -1)
+
+
+def make_data(lead_field, theta, n_trials, n_times, filter_length=200, n_predictors=1, snr=1.,
+              tstep=0.005, seed=0):
+    """Noisy MEG generated by the DstRF model
+
+    Parameters
+    ----------
+    lead_field: NDVar
+        lead-field from :func:`make_lead_field`
+    theta: ndarray
+        TRF coefficients from :func:`make_theta`
+    n_trials: int
+        number of trials
+    n_times: int
+        number of time points per trial
+    filter_length: int
+        TRF length in time bins
+    n_predictors: int
+        number of predictor variables
+    snr: float
+        ratio of signal to noise power at the sensors
+    tstep: float
+        sampling interval (s)
+    seed: int
+        seed for the random number generator
+
+    Returns
+    -------
+    data: REG_Data
+        the data, loaded
+    trials: list of (key, meg, stim) tuples
+        the NDVars that were loaded into ``data``
+    """
+    rng = np.random.RandomState(seed)
+    data = REG_Data(filter_length)
+    x = lead_field.get_data(('sensor', 'source', 'space') if lead_field.has_dim('space') else
+                            ('sensor', 'source'))
+    x = x.reshape(x.shape[0], -1)
+    time = UTS(0, tstep, n_times)
+    trials = []
+    for trial in range(n_trials):
+        key = 'trial%i' % trial
+        if n_predictors == 1:
+            stim = NDVar(rng.randn(n_times), (time,))
+        else:
+            stim = NDVar(rng.randn(n_predictors, n_times), (Case, time))
+        covariates = np.dot(covariate_from_stim(stim, filter_length), data.basis)
+        covariates = covariates.swapaxes(1, 0).reshape(covariates.shape[1], -1)
+        signal = np.dot(np.dot(x, theta), covariates.T)
+        y = rng.randn(x.shape[0], n_times)
+        noise_power = signal.var() / snr if signal.any() else 1.
+        y *= np.sqrt(noise_power)
+        y[:, filter_length - 1:] += signal
+        meg = NDVar(y, (lead_field.sensor, time))
+        data.load(key, meg, stim)
+        trials.append((key, meg, stim))
+    return data, trials
+
+
+def make_problem(n_sensors=50, n_sources=100, n_times=2000, n_trials=2, orientation='fixed',
+                 filter_length=200, n_predictors=1, seed=0):
+    """Lead-field, noise covariance, data and ground truth for a synthetic DstRF problem
+
+    Returns
+    -------
+    lead_field: NDVar
+    noise_covariance: ndarray
+    data: REG_Data
+    theta: ndarray
+        ground truth TRF coefficients
+    """
+    lead_field = make_lead_field(n_sensors, n_sources, orientation, seed)
+    theta = make_theta(n_sources, filter_length - 1, orientation, n_predictors=n_predictors, seed=seed)
+    data, _ = make_data(lead_field, theta, n_trials, n_times, filter_length, n_predictors, seed=seed)
+    return lead_field, np.eye(n_sensors), data, theta
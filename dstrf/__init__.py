@@ -1,4 +1,25 @@
-from ._model import DstRF, REG_Data, gaussian_basis
+from ._model import DstRF, REG_Data, gaussian_basis, svd_basis
+from ._cache import FitCache
+from ._distributed import connect, local_workers, serve_forever
 from ._fastac import Fasta
+from ._parallel import Parallelism, get_parallelism, set_parallelism
+from ._profile import FitStats
+from ._resampling import Resampler
 from . import dsyevh3C
-from ._data_loader import *
+
+__all__ = ['DstRF', 'REG_Data', 'gaussian_basis', 'svd_basis', 'FitCache', 'connect',
+           'local_workers', 'serve_forever', 'Fasta', 'Parallelism', 'get_parallelism',
+           'set_parallelism', 'FitStats', 'Resampler', 'dsyevh3C',
+           # imported on demand, see __getattr__
+           'load_subject', 'iter_subjects', 'learn_model_for_subject', 'learn_models']
+
+
+def __getattr__(name):
+    # the data loader reads the config module and needs eelbrain, import only on demand
+    if name in ('load_subject', 'iter_subjects', 'learn_model_for_subject'):
+        from . import _data_loader
+        return getattr(_data_loader, name)
+    elif name == 'learn_models':
+        from . import _batch
+        return _batch.learn_models
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
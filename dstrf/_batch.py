@@ -0,0 +1,210 @@
+# Author: Proloy Das <proloy@umd.edu>
+"""Fitting models for many subjects and regularization parameters in parallel"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import json
+import os
+import time
+import traceback
+
+from . import config as cfg
+from ._parallel import get_parallelism
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class BatchJob:
+    """Fit of one subject with one regularization parameter
+
+    Attributes
+    ----------
+    subject: str
+        subject id
+    mu: float
+        regularization parameter
+    path: str
+        output file for the TRF estimate
+    status: 'pending' | 'skipped' | 'done' | 'failed'
+        ``'skipped'`` means that ``path`` existed already
+    times: dict
+        time spent loading data, fitting and saving (s)
+    peak_memory: int
+        peak resident memory of the worker process up to the end of the job (bytes; None where
+        this is not available)
+    error: str
+        traceback of the exception if the job failed
+    """
+    def __init__(self, subject, mu, path):
+        self.subject = subject
+        self.mu = mu
+        self.path = path
+        self.status = 'pending'
+        self.times = {}
+        self.peak_memory = None
+        self.error = None
+
+    def __repr__(self):
+        return '<BatchJob %s, mu=%s: %s>' % (self.subject, self.mu, self.status)
+
+    def as_dict(self):
+        return {'subject': self.subject, 'mu': self.mu, 'path': self.path, 'status': self.status,
+                'times': self.times, 'peak_memory': self.peak_memory, 'error': self.error}
+
+
+def _peak_memory():
+    if resource is None:
+        return None
+    # ru_maxrss is in kB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _run_job(subject, mu, path, normalize):
+    "Runs in the worker process; returns the fields to update on the :class:`BatchJob`"
+    from ._data_loader import load_subject, _dump
+
+    times = {}
+    try:
+        t0 = time.time()
+        model, data = load_subject(subject, n_splits=1, normalize=normalize)
+        times['load'] = time.time() - t0
+        t0 = time.time()
+        model.fit(data, mu, tol=1e-5)
+        times['fit'] = time.time() - t0
+        t0 = time.time()
+        _dump(model.get_strf(data), path)
+        times['save'] = time.time() - t0
+    except Exception:
+        return {'status': 'failed', 'times': times, 'peak_memory': _peak_memory(),
+                'error': traceback.format_exc()}
+    return {'status': 'done', 'times': times, 'peak_memory': _peak_memory()}
+
+
+def learn_models(subjects, mus, n_jobs=None, memory_limit=None, job_memory=None, normalize='l1',
+                 overwrite=False, log_file=None, verbose=True):
+    """Fits and saves a model for every combination of subject and mu
+
+    Jobs run in a pool of ``n_jobs`` worker processes. Each job loads the subject's data with
+    :func:`load_subject`, fits the model and pickles the TRF estimate to
+    ``config.trf_file % (subject, mu)``. Outputs are written under a temporary name and renamed
+    when complete, so an interrupted batch can be resumed by running it again. If a worker
+    process dies (e.g., killed for running out of memory), the jobs that were running in the
+    pool are rerun one at a time, so that only the job that crashed its worker fails.
+
+    Parameters
+    ----------
+        subjects: list of str
+            subject ids
+        mus: list of float
+            regularization parameters
+        n_jobs: int
+            maximum number of jobs running at the same time (default: as many as the
+            :class:`Parallelism` policy allows). The policy's cores are split evenly between
+            the jobs for their BLAS threads.
+        memory_limit: int
+            total memory (bytes) the running jobs may use. Jobs are started only while the
+            expected memory of all running jobs stays within the limit (at least one job
+            always runs).
+        job_memory: int
+            expected memory of one job (bytes). By default, the first job runs alone and the
+            largest peak memory of finished jobs is used.
+        normalize: 'l1' | None
+            Normalization method of the predictors
+        overwrite: bool
+            refit models whose output file exists already (default: skip them)
+        log_file: str
+            write the job records as JSON to this file whenever a job finishes
+        verbose: bool
+            print a line when a job finishes
+
+    Returns
+    -------
+    list of BatchJob
+    one record for every combination of subject and mu
+    """
+    jobs = [BatchJob(subject, mu, cfg.trf_file % (subject, mu)) for subject in subjects for mu in mus]
+    pending = []
+    for job in jobs:
+        if not overwrite and os.path.exists(job.path):
+            job.status = 'skipped'
+        else:
+            pending.append(job)
+
+    if n_jobs is None:
+        n_jobs = get_parallelism().split(max(1, len(pending)))[0]
+    initializer, initargs = get_parallelism().initializer(n_jobs)
+
+    def expected_memory():
+        if job_memory is not None:
+            return job_memory
+        observed = [job.peak_memory for job in jobs if job.peak_memory is not None]
+        return max(observed) if observed else None
+
+    def can_start(job):
+        n_running = len(running)
+        if n_running and (job in suspects or any(job_ in suspects for job_ in running.values())):
+            # jobs that might have crashed a worker run alone
+            return False
+        elif n_running >= n_jobs:
+            return False
+        elif memory_limit is None or n_running == 0:
+            return True
+        estimate = expected_memory()
+        return estimate is not None and (n_running + 1) * estimate <= memory_limit
+
+    def write_log():
+        if log_file is not None:
+            with open(log_file, 'w') as f:
+                json.dump([job.as_dict() for job in jobs], f, indent=1)
+
+    def finish(job, result):
+        suspects.discard(job)
+        for key, value in result.items():
+            setattr(job, key, value)
+        if verbose:
+            print('%s, mu=%s: %s %s' % (job.subject, job.mu, job.status,
+                                        ', '.join('%s %.1f s' % item for item in job.times.items())))
+        write_log()
+
+    def collect(futures):
+        "Finishes the jobs of completed ``futures``; returns those lost with a broken pool"
+        crashed = []
+        for future in futures:
+            job = running.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                crashed.append((job, traceback.format_exc()))
+            else:
+                finish(job, result)
+        return crashed
+
+    pool = ProcessPoolExecutor(n_jobs, initializer=initializer, initargs=initargs)
+    running = {}
+    suspects = set()  # jobs that were running when a worker died
+    try:
+        while pending or running:
+            while pending and can_start(pending[0]):
+                job = pending.pop(0)
+                running[pool.submit(_run_job, job.subject, job.mu, job.path, normalize)] = job
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            crashed = collect(done)
+            if crashed:
+                # a worker died (e.g., killed for running out of memory), which breaks all jobs
+                # in the pool
+                pool.shutdown(wait=True)
+                crashed.extend(collect(list(running)))
+                pool = ProcessPoolExecutor(n_jobs, initializer=initializer, initargs=initargs)
+                if len(crashed) == 1:
+                    job, error = crashed[0]
+                    finish(job, {'status': 'failed', 'error': error})
+                else:
+                    # the job that crashed is unknown; rerun each of them alone
+                    suspects.update(job for job, _ in crashed)
+                    pending[:0] = [job for job, _ in crashed]
+    finally:
+        pool.shutdown(wait=True)
+    write_log()
+    return jobs
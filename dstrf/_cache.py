@@ -0,0 +1,123 @@
+# Author: Proloy Das <proloy@umd.edu>
+"""Memoizing the results of :meth:`DstRF.fit`"""
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+
+import numpy as np
+
+
+class FitCache:
+    """Cache of fitted model states, keyed by a fingerprint of the inputs to :meth:`DstRF.fit`
+
+    The fingerprint covers the lead-field, the noise covariance, the sufficient statistics of
+    the data, ``mu``, ``tol`` and the iteration and stopping settings. Pass the cache to
+    :meth:`DstRF.fit` as ``cache``; on a hit, ``theta``, ``Gamma`` and ``Sigma_b`` are restored
+    instead of fitting.
+
+    Parameters
+    ----------
+    maxsize: int
+        number of fits to keep in memory (least recently used ones are dropped).
+    path: str, optional
+        directory for a persistent cache on disk.
+    disk_limit: int, optional
+        maximum size of the disk cache (bytes); least recently used fits are deleted when it
+        is exceeded.
+
+    Notes
+    -----
+    The random perturbation FASTA uses to estimate its initial step size is not part of the
+    fingerprint, so a hit returns the result of the first fit, not necessarily the bit-identical
+    result a new fit with a different random state would produce.
+    """
+    def __init__(self, maxsize=8, path=None, disk_limit=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.disk_limit = disk_limit
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        if path is not None and not os.path.exists(path):
+            os.makedirs(path)
+
+    def __repr__(self):
+        return '<FitCache: %i in memory, %i hits, %i misses>' % (len(self._memory), self.hits,
+                                                                 self.misses)
+
+    @staticmethod
+    def fingerprint(model, data, mu, tol, **kwargs):
+        "Hash identifying a fit of ``model`` to ``data``"
+        h = hashlib.sha1()
+
+        def update(x):
+            if isinstance(x, np.ndarray):
+                x = np.ascontiguousarray(x)
+                h.update(repr((x.dtype.str, x.shape)).encode())
+                h.update(x.view(np.uint8).ravel())
+            else:
+                h.update(repr(x).encode())
+
+        for x in (model.lead_field, model.noise_covariance, model.orientation, model.n_iter,
+                  model.n_iterc, model.n_iterf, model.gap_tol, model.source_covariance, mu, tol,
+                  sorted(kwargs.items()), data.datakeys, data.basis, *data._bbt, *data._bE,
+                  *data._EtE):
+            update(x)
+        return h.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.pickled')
+
+    def get(self, key):
+        "Stored state for ``key``, or None"
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        if self.path is not None and os.path.exists(self._file(key)):
+            with open(self._file(key), 'rb') as f:
+                state = pickle.load(f)
+            os.utime(self._file(key))  # mark as recently used
+            self._remember(key, state)
+            self.hits += 1
+            return state
+        self.misses += 1
+        return None
+
+    def put(self, key, state):
+        self._remember(key, state)
+        if self.path is not None:
+            tmp_file = self._file(key) + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, self._file(key))
+            self._limit_disk()
+
+    def _remember(self, key, state):
+        self._memory[key] = state
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _limit_disk(self):
+        if self.disk_limit is None:
+            return
+        files = [os.path.join(self.path, name) for name in os.listdir(self.path)
+                 if name.endswith('.pickled')]
+        files.sort(key=os.path.getmtime)
+        size = sum(os.path.getsize(path) for path in files)
+        # always keep the most recent fit
+        for path in files[:-1]:
+            if size <= self.disk_limit:
+                break
+            size -= os.path.getsize(path)
+            os.remove(path)
+
+    def clear(self):
+        "Remove all entries, in memory and on disk"
+        self._memory.clear()
+        if self.path is not None:
+            for name in os.listdir(self.path):
+                if name.endswith('.pickled'):
+                    os.remove(os.path.join(self.path, name))
@@ -1,12 +1,13 @@
 # Author: Proloy Das <proloy@umd.edu>
 from . import config as cfg
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
 import pickle
 import numpy as np
 from scipy import io, linalg
 
-from eelbrain import *
-
 from ._model import DstRF, REG_Data
 
 
@@ -44,6 +45,8 @@ def load_subject(subject_id, n_splits=1, normalize=None):
     -------
     a tuple (DstRF object, REGData object)
     """
+    from eelbrain import filter_data, resample
+
     # LOAD LEAD_FIELD MATRIX
     with open(cfg.fwdsol_file % subject_id, 'rb') as f:
         lead_field = pickle.load(f)
@@ -68,11 +71,9 @@ def load_subject(subject_id, n_splits=1, normalize=None):
     noise_cov = np.eye(er.shape[0])
 
     # INITIALIZE DstRF object
-    R = [
-        DstRF(lead_field, noise_cov, n_iter=cfg.n_iter, n_iterc=cfg.n_iterc, n_iterf=cfg.n_iterf)  # 20 for
-        # cross-validation
-        for _ in range(n_splits)
-    ]
+    R = [DstRF(lead_field, noise_cov, n_iter=cfg.n_iter, n_iterc=cfg.n_iterc, n_iterf=cfg.n_iterf)]  # 20 for
+    # cross-validation; the splits share the whitened lead-field
+    R.extend(R[0].copy() for _ in range(n_splits - 1))
     if len(R) == 1:
         R = R[0]
 
@@ -105,12 +106,111 @@ def load_subject(subject_id, n_splits=1, normalize=None):
     return R, ds
 
 
-def learn_model_for_subject(subject_id, mu, normalize='l1'):
-    """Loads the data and performs model fitting using given mu"""
+def iter_subjects(subjects, n_splits=1, normalize=None, prefetch=1, memory_limit=None):
+    """Yields the data of one subject after the other, loading the next ones in the background
+
+    While the caller processes one subject (e.g., fits the model), the following subjects are
+    read, filtered and resampled in a background thread, so that loading overlaps with fitting.
+
+    Parameters
+    ----------
+        subjects: list of str
+            subject ids
+        n_splits: int (Default 1)
+            Decides how many instances of DstRF object to return.
+        normalize: 'l1' | None (default)
+            Normalization method
+        prefetch: int
+            number of subjects to load ahead of the one being processed
+        memory_limit: int
+            bound (bytes) for the data of the subject being processed and of the prefetched
+            subjects together. No further subjects are prefetched while the size of the
+            largest subject loaded so far would exceed it (the next subject is always loaded).
+    Returns
+    -------
+    generator of (DstRF object, REGData object) tuples, in the order of ``subjects`` (see
+    :func:`load_subject`)
+
+    Notes
+    -----
+    Data of a subject are only released when the caller drops its references, so prefetching
+    adds to the memory of the subject being processed.
+    """
+    subjects = list(subjects)
+    sizes = []
+    pending = deque()
+    executor = ThreadPoolExecutor(1)
+
+    def can_prefetch(n_ahead):
+        # n_ahead subjects (including the one to start) beyond the one being processed
+        if n_ahead > prefetch:
+            return False
+        elif memory_limit is None:
+            return True
+        return (n_ahead + 1) * max(sizes) <= memory_limit
+
+    try:
+        for i in range(len(subjects)):
+            if not pending:
+                pending.append(executor.submit(load_subject, subjects[i], n_splits, normalize))
+            result = pending.popleft().result()
+            sizes.append(_subject_size(*result))
+            while (i + 1 + len(pending) < len(subjects) and can_prefetch(len(pending) + 1)):
+                subject = subjects[i + 1 + len(pending)]
+                pending.append(executor.submit(load_subject, subject, n_splits, normalize))
+            yield result
+            del result
+    finally:
+        # do not wait for prefetched subjects the caller will not ask for (cancelled here rather
+        # than with shutdown(cancel_futures=True), which needs Python 3.9)
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _subject_size(models, ds):
+    "Bytes held by the result of :func:`load_subject`"
+    model = models[0] if isinstance(models, list) else models  # the splits share arrays
+    arrays = [model.lead_field, model.noise_covariance, *ds.meg.values(), *ds.covariates.values()]
+    return sum(x.nbytes for x in arrays)
+
+
+def learn_model_for_subject(subject_id, mu, normalize='l1', trf_file=None, verbose=True):
+    """Loads the data and performs model fitting using given mu
+
+    Parameters
+    ----------
+        subject_id: str
+            File names are identified from this variable
+        mu: float
+            regularization parameter
+        normalize: 'l1' | None
+            Normalization method of the predictors
+        trf_file: str
+            path for the pickled TRF estimate (default: ``config.trf_file % (subject_id, mu)``).
+            The file is written under a temporary name first and then renamed, so an existing
+            file always holds a complete result.
+        verbose: bool
+            print progress of the fit
+    Returns
+    -------
+    str
+    path of the TRF file
+    """
+    if trf_file is None:
+        trf_file = cfg.trf_file % (subject_id, mu)
     R, ds = load_subject(subject_id, n_splits=1, normalize=normalize)
-    R.fit(ds, mu, tol=1e-5, verbose=True)
+    R.fit(ds, mu, tol=1e-5, verbose=verbose)
     trf = R.get_strf(ds)
-    with open(cfg.trf_file % subject_id, 'wb') as f:
-        pickle.dump(trf, f)
-
-    return
+    _dump(trf, trf_file)
+    return trf_file
+
+
+def _dump(obj, path):
+    "Pickles ``obj`` under a temporary name first, so that ``path`` only ever holds complete files"
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(obj, f)
+    os.replace(path + '.tmp', path)
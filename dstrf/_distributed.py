@@ -0,0 +1,216 @@
+# Author: Proloy Das <proloy@umd.edu>
+"""Fitting with trials sharded across worker processes, possibly on other machines
+
+Workers and the coordinator exchange pickled messages over connections with ``send()`` and
+``recv()`` methods, such as :class:`multiprocessing.connection.Connection`. Any other transport
+providing these two methods (and ``close()``) can be used instead.
+"""
+import multiprocessing
+from multiprocessing.connection import Client, Listener
+import traceback
+import weakref
+
+import numpy as np
+
+# connections to worker processes on this machine, which can open the coordinator's files
+_local_connections = weakref.WeakSet()
+
+
+def serve(connection):
+    """Runs a worker on ``connection`` until the coordinator closes it
+
+    The worker holds the data, ``Gamma`` and ``Sigma_b`` of its shard of trials and
+    evaluates the shard's contributions to the objective, its gradient and the Champagne
+    step for the ``theta`` the coordinator broadcasts. The shard's data is sent by the
+    coordinator, or loaded by the worker itself if the coordinator sends a callable.
+    """
+    model = data = funct = grad_funct = None
+    while True:
+        try:
+            command, args = connection.recv()
+        except EOFError:
+            break
+        try:
+            result = None
+            if command == 'setup':
+                model, data = args
+                if callable(data):
+                    data = data()
+                model._set_mu(model.mu, data)
+                model._plan_memory(data)
+                result = (data.datakeys, model.theta.shape)
+            elif command == 'construct_f':
+                funct, grad_funct = model._construct_f(data)
+            elif command == 'f':
+                result = funct(*args)
+            elif command == 'gradf':
+                result = grad_funct(*args)
+            elif command == 'solve':
+                model._solve(data, *args)
+            elif command == 'eval_obj':
+                model.theta, = args
+                result = model._eval_obj_statistics(data)
+            elif command == 'state':
+                result = (model.Gamma, model.Sigma_b)
+            elif command == 'close':
+                connection.send(('ok', None))
+                break
+            else:
+                raise ValueError("Unknown command %r" % (command,))
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+        else:
+            connection.send(('ok', result))
+    connection.close()
+
+
+def serve_forever(address, authkey):
+    """Accepts coordinator connections on ``address`` and serves them one after the other
+
+    Run this on every machine that should contribute a worker, e.g.::
+
+        $ python -c "from dstrf import serve_forever; serve_forever(('', 6000), b'secret')"
+
+    Parameters
+    ----------
+    address: tuple
+        ``(host, port)`` to listen on
+    authkey: bytes
+        key the coordinator needs to connect (see :func:`connect`)
+    """
+    with Listener(address, authkey=authkey) as listener:
+        while True:
+            serve(listener.accept())
+
+
+def connect(addresses, authkey):
+    """Connects to workers started with :func:`serve_forever`
+
+    Parameters
+    ----------
+    addresses: list of tuple
+        ``(host, port)`` of each worker
+    authkey: bytes
+        key the workers were started with
+
+    Returns
+    -------
+    list of Connection
+    """
+    return [Client(address, authkey=authkey) for address in addresses]
+
+
+def local_workers(n):
+    """Starts ``n`` worker processes on this machine
+
+    Returns
+    -------
+    list of Connection
+    connections to the workers; a worker exits when its connection is closed
+    """
+    connections = []
+    for _ in range(n):
+        connection, worker_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=serve, args=(worker_connection,), daemon=True)
+        process.start()
+        worker_connection.close()
+        _local_connections.add(connection)
+        connections.append(connection)
+    return connections
+
+
+def _split_statistics(data, n):
+    "Splits the sufficient statistics of ``data`` round-robin into ``n`` shards"
+    data._precompute()
+    n = min(n, len(data.datakeys))
+    shards = []
+    for i in range(n):
+        trials = range(i, len(data.datakeys), n)
+        shards.append(data._with_statistics([data.datakeys[trial] for trial in trials],
+                                            [data._bbt[trial] for trial in trials],
+                                            [data._bE[trial] for trial in trials],
+                                            [data._EtE[trial] for trial in trials]))
+    return shards
+
+
+class _Shards:
+    """Coordinator side of a fit with trials sharded across workers
+
+    Every worker receives a shard (a REG_Data instance, or a callable the worker calls to load
+    its REG_Data) and initializes ``Gamma`` and ``Sigma_b`` of its trials itself. Each outer
+    iteration, the coordinator broadcasts ``theta`` and sums the objective values and gradients
+    the workers return; the Champagne step runs on the workers, and ``Gamma`` and ``Sigma_b``
+    are only gathered at the end (:meth:`gather`).
+    """
+    def __init__(self, model, shards, connections):
+        if len(shards) > len(connections):
+            raise ValueError("%i shards for %i workers; need at most one shard per worker" %
+                             (len(shards), len(connections)))
+        self.model = model
+        self.connections = connections[:len(shards)]
+        for shard, connection in zip(shards, self.connections):
+            shard_model = model.copy()
+            shard_model.mu = model.mu
+            if connection not in _local_connections:
+                # a lead-field shared with share_lead_field() is pickled as its file name, which
+                # workers on other machines can not open; send its contents instead
+                shard_model.lead_field = np.asarray(model.lead_field)
+            connection.send(('setup', (shard_model, shard)))
+        results = self._gather()
+        shapes = {shape for _, shape in results}
+        if len(shapes) > 1:
+            raise ValueError("Shards differ in the number of predictors or basis atoms")
+        model.keys = [key for keys, _ in results for key in keys]
+        if len(set(model.keys)) < len(model.keys):
+            raise ValueError("Shards share trial keys")
+        model.Gamma = {}
+        model.Sigma_b = {}
+        model.theta = np.zeros(shapes.pop())
+        self.n_trials = len(model.keys)
+
+    def _broadcast(self, command, *args):
+        for connection in self.connections:
+            connection.send((command, args))
+        return self._gather()
+
+    def _gather(self):
+        results = []
+        errors = []
+        for connection in self.connections:
+            status, result = connection.recv()
+            if status == 'error':
+                errors.append(result)
+            results.append(result)
+        if errors:
+            raise RuntimeError("Error in worker:\n%s" % errors[0])
+        return results
+
+    def construct_f(self):
+        self._broadcast('construct_f')
+
+        def funct(x):
+            fval = 0.0
+            for val in self._broadcast('f', x):
+                fval += val
+            return fval
+
+        def grad_funct(x):
+            grads = self._broadcast('gradf', x)
+            grad = grads[0]
+            for val in grads[1:]:
+                grad += val
+            return grad
+
+        return funct, grad_funct
+
+    def solve(self, theta):
+        self._broadcast('solve', theta)
+
+    def eval_obj(self):
+        return sum(self._broadcast('eval_obj', self.model.theta)) / self.n_trials
+
+    def gather(self):
+        "Copies ``Gamma`` and ``Sigma_b`` of all trials from the workers to the model"
+        for gamma, sigma_b in self._broadcast('state'):
+            self.model.Gamma.update(gamma)
+            self.model.Sigma_b.update(sigma_b)
@@ -69,6 +69,42 @@ def _compute_residual(deltax, deltaF, tau):
     return ((deltaF - deltax) ** 2).sum() / (tau ** 2)
 
 
+def _duality_gap(x, fx, gx, gradfx, dual_norm):
+    """Duality gap at x for least squares problems
+
+    For :math:`f(x) = .5||Ax-b||^2`, the scaled residual :math:`u = s(b - Ax)` is dual feasible
+    whenever :math:`dual\_norm(A^Tu) \leq 1`, and the dual objective
+    :math:`<b, u> - .5||u||^2` lower-bounds the optimum. Everything needed follows from f and
+    its gradient: :math:`A^T(b - Ax) = -\nabla f(x)`, :math:`||b - Ax||^2 = 2f(x)` and
+    :math:`<b, b - Ax> = 2f(x) - <x, \nabla f(x)>`.
+
+    parameters
+    ----------
+    x: ndarray
+        current coefficients
+
+    fx, gx: float
+        f(x) and g(x)
+
+    gradfx: ndarray
+        gradient operator evaluated at x
+
+    dual_norm: function handle
+        norm dual to g, see :class:`Fasta`
+
+    returns
+    -------
+    float
+    primal minus dual objective
+    """
+    br = 2 * fx - (x * gradfx).sum()
+    norm = dual_norm(gradfx)
+    bound = np.inf if norm == 0 else 1 / norm
+    # the feasible scaling maximizing the dual objective
+    s = np.clip(br / (2 * fx), -bound, bound) if fx > 0 else 0
+    return fx + gx - (s * br - s ** 2 * fx)
+
+
 def _update_coefs(x, tau, gradfx, prox, f, beta, fk):
     """Non-monotone line search
 
@@ -145,6 +181,16 @@ class Fasta:
         number of iterations
         default is 1000
 
+    random_state: numpy.random.RandomState, optional
+        source of the random perturbation used to estimate the initial step size
+        default is numpy's global random state
+
+    dual_norm: function handle, optional
+        norm dual to :math:`g(x)`, scaled such that :math:`g^*(v)` is finite iff
+        :math:`dual\_norm(v) \leq 1` (e.g., :math:`\|v\|_\infty / \mu` for
+        :math:`g(x) = \mu\|x\|_1`). Needed for stopping on the duality gap, which
+        further requires :math:`f(x)` to be a least squares term :math:`.5||Ax-b||^2`.
+
     Attributes
     ----------
     coefs: ndvar
@@ -156,6 +202,10 @@ class Fasta:
     residuals: list
         residual values at each iteration
 
+    gaps: list
+        duality gaps at each iteration
+        created only with the gap_tol option of learn()
+
     initial_stepsize: float, optional
         created only with verbose=1 option
 
@@ -170,6 +220,9 @@ class Fasta:
     backtracks: list, optional
         number of backtracking steps
         created only with verbose=1 option
+
+    n_backtracks: int
+        total number of backtracking steps
     Notes
     -----
     Make sure that outputs of gradf and proxg is of same size as x.
@@ -193,20 +246,23 @@ class Fasta:
 
     """
 
-    def __init__(self, f, g, gradf, proxg, beta=0.5, n_iter=1000):
+    def __init__(self, f, g, gradf, proxg, beta=0.5, n_iter=1000, random_state=None,
+                 dual_norm=None):
         self.f = f
         self.g = g
         self.grad = gradf
         self.prox = proxg
         self.beta = beta
         self.n_iter = n_iter
+        self.random_state = np.random if random_state is None else random_state
+        self.dual_norm = dual_norm
         self.residuals = []
         self._funcValues = []
 
     def __str__(self):
         return "Fast adaptive shrinkage/thresholding Algorithm instance"
 
-    def learn(self, coefs_init, tol=1e-2, verbose=0):
+    def learn(self, coefs_init, tol=1e-2, verbose=0, gap_tol=None):
         """fits the model using FASTA algorithm
 
         parameters
@@ -222,19 +278,28 @@ class Fasta:
             verbosity of the method : 1 will display informations while 0 will display nothing
             default = 0
 
+        gap_tol: float, optional
+            stop when the duality gap is below ``gap_tol`` times the objective value, instead
+            of using the residual (requires ``dual_norm``)
+
         returns
         -------
         self
         """
+        if gap_tol is not None:
+            if self.dual_norm is None:
+                raise ValueError("gap_tol requires Fasta with dual_norm")
+            self.gaps = []
         coefs_current = np.copy(coefs_init)
         grad_current = self.grad(coefs_current)
         coefs_next = coefs_current \
-                     + 0.01 * np.random.randn(coefs_current.shape[0], coefs_current.shape[1])
+                     + 0.01 * self.random_state.randn(coefs_current.shape[0], coefs_current.shape[1])
         grad_next = self.grad(coefs_next)
         tau_current = _next_stepsize(coefs_next - coefs_current,
                                      grad_next - grad_current)
 
         self._funcValues.append(self.f(coefs_current))
+        self.n_backtracks = 0
         if verbose == 1:
             self.objective = []
             self.objective.append(self._funcValues[-1] + self.g(coefs_current))
@@ -249,6 +314,7 @@ class Fasta:
                                 self.prox, self.f, self.beta, max(self._funcValues))
 
             self._funcValues.append(objective_next)
+            self.n_backtracks += n_backtracks
 
             grad_next = self.grad(coefs_next)
 
@@ -261,6 +327,14 @@ class Fasta:
             # Find step size for next iteration
             tau_next = _next_stepsize(delta_coef, delta_grad)
 
+            if gap_tol is None:
+                converged = residual < tol
+            else:
+                g_next = self.g(coefs_next)
+                self.gaps.append(_duality_gap(coefs_next, objective_next, g_next, grad_next,
+                                              self.dual_norm))
+                converged = self.gaps[-1] <= gap_tol * abs(objective_next + g_next)
+
             if verbose == 1:
                 self.stepsizes.append(tau)
                 self.backtracks.append(n_backtracks)
@@ -276,7 +350,7 @@ class Fasta:
             coefs_current = coefs_next
             grad_current = grad_next
 
-            if tau_next == 0 or residual < tol:  # convergence reached
+            if tau_next == 0 or converged:  # convergence reached
                 break
             elif tau_next < 0:  # non-convex probelms ->  negative stepsize -> use the previous value
                 tau_current = tau
@@ -1,14 +1,17 @@
 # Author: Proloy Das <proloy@umd.edu>
 import numpy as np
 from scipy import linalg
-from eelbrain import *
+from contextlib import nullcontext
 from math import sqrt
+import os
+import pickle
+import shutil
 import time
-
-# Some specialized functions
-from numpy.core.umath_tests import inner1d
+import warnings
 
 from ._fastac import Fasta
+from ._parallel import SERIAL, get_parallelism
+from ._profile import FitStats, NO_STATS
 from . import opt
 from .dsyevh3C import compute_gamma_c
 
@@ -16,26 +19,34 @@ from .dsyevh3C import compute_gamma_c
 orientation = {'fixed': 1, 'free': 3}
 
 
-def gaussian_basis(nlevel, span):
+def gaussian_basis(nlevel, span, n_atoms=None, std=8.5):
     """Construct Gabor basis for the TRFs.
 
     Parameters
     ----------
         nlevel: int
-            number of atoms
+            number of levels the span is divided into: the atoms are centered between
+            ``span[-1] / nlevel`` and ``span[-1] * (1 - 1 / nlevel)``
         span: ndarray
             the span to cover by the atoms
+        n_atoms: int, optional
+            number of atoms, spaced evenly over that range (default: ``nlevel - 1``, one atom
+            at every level); fewer atoms (with a larger ``std``) make a smaller basis.
+        std: float
+            width of the atoms, in units of ``span``
 
     Returns
     -------
     Gabor atoms
     """
     x = span
-    means = np.linspace(x[-1] / nlevel, x[-1] * (1 - 1 / nlevel), num=nlevel - 1)
-    stds = 8.5
+    if n_atoms is None:
+        n_atoms = nlevel - 1
+    means = np.linspace(x[-1] / nlevel, x[-1] * (1 - 1 / nlevel), num=n_atoms)
+    stds = std
     W = []
 
-    for count in list(range(nlevel - 1)):
+    for count in list(range(n_atoms)):
         W.append(np.exp(-(x - means[count]) ** 2 / (2 * stds ** 2)))
 
     W = np.array(W)
@@ -43,6 +54,30 @@ def gaussian_basis(nlevel, span):
     return W.T / np.max(W)
 
 
+def svd_basis(basis, n_atoms):
+    """Compress a basis to the ``n_atoms`` leading left singular vectors
+
+    The truncated basis spans the part of the response space the original basis represents
+    best, with orthogonal atoms.
+
+    Parameters
+    ----------
+        basis: ndarray
+            array of shape (filter_length, n), e.g. from :func:`gaussian_basis`
+        n_atoms: int
+            number of atoms to keep
+
+    Returns
+    -------
+    array of shape (filter_length, n_atoms)
+    """
+    u, s, vh = linalg.svd(basis, full_matrices=False)
+    u = u[:, :n_atoms]
+    # make the largest excursion of every atom positive
+    u *= np.sign(u[np.abs(u).argmax(axis=0), np.arange(u.shape[1])])
+    return u / np.abs(u).max()
+
+
 def g(x, mu):
     """vector l1-norm penalty
 
@@ -145,13 +180,60 @@ def proxg_group_opt(z, mu):
     return z
 
 
+class _Penalty:
+    """Penalty g(x) and its proximal operator, evaluated in place by the parallel Cython kernels
+
+    The kernels compute the penalty of their result in the same pass, so that g() of the last
+    prox() result (which FASTA asks for at every iteration) is free.
+
+    Parameters
+    ----------
+    mu: float
+        regularizing parameter
+    dc: int
+        1 for fixed orientation (l1 penalty) and 3 for free orientation (l12 penalty)
+    """
+    def __init__(self, mu, dc):
+        self.mu = mu
+        self.dc = dc
+        self._z = None
+        self._value = None
+
+    def g(self, x):
+        if x is self._z:
+            return self._value
+        if self.dc == 1:
+            return g(x, self.mu)
+        else:
+            return g_group(x, self.mu)
+
+    def prox(self, x, t):
+        "Overwrites x (if it is C-contiguous float64) with prox_{t g}(x)"
+        z = np.ascontiguousarray(x, np.float64)
+        if self.dc == 1:
+            penalty = opt.cshrink_inplace(z, self.mu * t)
+        else:
+            penalty = opt.cproxg_group_inplace(z.reshape((-1, 3, z.shape[1])), self.mu * t)
+        self._z = z
+        self._value = self.mu * penalty
+        return z
+
+    def dual_norm(self, v):
+        "Norm dual to g, such that points of the dual domain of g have ``dual_norm(v) <= 1``"
+        if self.dc == 1:
+            norm = np.abs(v).max()
+        else:
+            norm = np.sqrt((v.reshape((-1, 3, v.shape[1])) ** 2).sum(axis=1)).max()
+        return norm / self.mu if self.mu else np.inf
+
+
 def covariate_from_stim(stim, M, normalize=False):
     """Form covariate matrix from stimulus
 
     parameters
     ----------
-    stim: ndvar
-        array of shape (1, T)
+    stim: NDVar | ndarray
+        array of shape (T,) or (n_predictors, T)
         predictor variables
 
     M: int
@@ -165,17 +247,56 @@ def covariate_from_stim(stim, M, normalize=False):
     covariate matrix: ndarray
 
     """
-    if stim.has_case:
+    w = _stim_data(stim)
+
+    if normalize:
+        w = _normalize_stim(w)
+
+    return _lag_matrix(w, M)
+
+
+def _normalize_stim(w):
+    w = w - w.mean(axis=0)
+    w /= w.var(axis=0)
+    return w
+
+
+def _stim_data(stim):
+    """Extracts the stimulus as an array of shape (n_predictors, T)"""
+    if not hasattr(stim, 'get_data'):
+        w = np.asarray(stim, dtype=np.float64)
+    elif stim.has_case:
         w = stim.get_data(('case', 'time'))
     else:
         w = stim.get_data('time')
-        if w.ndim == 1:
-            w = w[np.newaxis, :]
+    if w.ndim == 1:
+        w = w[np.newaxis, :]
+    return w
 
-    if normalize:
-        w -= w.mean(axis=0)
-        w /= w.var(axis=0)
 
+def _meg_data(meg):
+    """Extracts MEG data as a float64 array of shape (K, T), without copying arrays"""
+    if hasattr(meg, 'get_data'):
+        meg = meg.get_data(('sensor', 'time'))
+    return np.asarray(meg, dtype=np.float64)
+
+
+def _lag_matrix(w, M):
+    """Lagged copies of the stimulus
+
+    parameters
+    ----------
+    w: ndarray
+        array of shape (n_predictors, T)
+
+    M: int
+        order of filter
+
+    returns
+    -------
+    ndarray
+    array of shape (n_predictors, T - M + 1, M)
+    """
     length = w.shape[1]
     Y = []
     for j in range(w.shape[0]):
@@ -189,6 +310,118 @@ def covariate_from_stim(stim, M, normalize=False):
     return np.array(Y)
 
 
+def _lagged_projection(w, M, basis, chunk_size=None):
+    """``np.dot(_lag_matrix(w, M), basis)``, with lag matrices of ``chunk_size`` rows at a time
+
+    parameters
+    ----------
+    w: ndarray
+        array of shape (n_predictors, T)
+
+    M: int
+        order of filter
+
+    basis: ndarray
+        array of shape (M, n_atoms)
+
+    chunk_size: int, optional
+        number of time points for which lagged copies are formed at once (default: all)
+
+    returns
+    -------
+    ndarray
+    array of shape (n_predictors, T - M + 1, n_atoms)
+    """
+    n = w.shape[1] - M + 1
+    if chunk_size is None or chunk_size >= n:
+        return np.dot(_lag_matrix(w, M), basis)
+    out = np.empty((w.shape[0], n, basis.shape[1]))
+    for start in range(0, n, chunk_size):
+        stop = min(n, start + chunk_size)
+        out[:, start:stop] = np.dot(_lag_matrix(w[:, start:stop + M - 1], M), basis)
+    return out
+
+
+def _correlations(u, w, M):
+    """``c[..., m] = sum_t u[..., t] w[..., t + M - 1 - m]`` for lags ``m < M``, using FFTs
+
+    ``u`` and ``w`` broadcast against each other except in the last (time) axis, where
+    ``w`` is ``M - 1`` samples longer than ``u``.
+    """
+    from scipy import fft  # slow to import, only needed with REG_Data(statistics='fft')
+
+    n = fft.next_fast_len(u.shape[-1] + w.shape[-1])
+    c = fft.irfft(np.conj(fft.rfft(u, n)) * fft.rfft(w, n), n)
+    return c[..., M - 1::-1]
+
+
+def _lagged_gram(w, M):
+    """Gram matrices of the lag matrices of all pairs of predictors
+
+    ``r[p, q] = np.dot(_lag_matrix(w, M)[p].T, _lag_matrix(w, M)[q])``, computed from the
+    cross-correlations of the predictors: the first row of each (Toeplitz-like) block follows
+    from the correlations at lags up to ``M``, and every further row from the previous one by
+    adding the samples entering and removing the samples leaving the lag window.
+
+    parameters
+    ----------
+    w: ndarray
+        array of shape (n_predictors, T)
+
+    M: int
+        order of filter
+
+    returns
+    -------
+    ndarray
+    array of shape (n_predictors, n_predictors, M, M)
+    """
+    first_row = _correlations(w[:, np.newaxis, M - 1:], w[np.newaxis], M)
+    r = np.empty(first_row.shape[:2] + (M, M))
+    r[..., 0, :] = first_row
+    r[..., :, 0] = first_row.swapaxes(0, 1)
+    head = w[:, M - 2::-1] if M > 1 else w[:, :0]
+    tail = w[:, ::-1][:, :M - 1]
+    diff = (head[:, np.newaxis, :, np.newaxis] * head[np.newaxis, :, np.newaxis, :] -
+            tail[:, np.newaxis, :, np.newaxis] * tail[np.newaxis, :, np.newaxis, :])
+    for i in range(1, M):
+        r[..., i, 1:] = r[..., i - 1, :-1] + diff[..., i - 1, :]
+    return r
+
+
+def _fft_statistics(y, w, M, basis):
+    """Sufficient statistics of a trial from auto- and cross-correlations, without covariates
+
+    parameters
+    ----------
+    y: ndarray
+        meg data of shape (K, T - M + 1), starting at sample ``M - 1`` of the stimulus
+
+    w: ndarray
+        array of shape (n_predictors, T)
+
+    M: int
+        order of filter
+
+    basis: ndarray
+        array of shape (M, n_atoms)
+
+    returns
+    -------
+    bbt, bE, EtE: ndarray
+    the statistics :meth:`REG_Data._precompute` computes from the normalized data
+    """
+    n = y.shape[1]
+    n_predictors, n_atoms = w.shape[0], basis.shape[1]
+    bbt = np.dot(y, y.T) / n
+    # one predictor at a time keeps the spectra of the cross-correlations small
+    bE = np.concatenate([np.dot(_correlations(y, w[p], M), basis) for p in range(n_predictors)],
+                        axis=1) / n
+    EtE = np.matmul(np.matmul(basis.T, _lagged_gram(w, M)), basis)
+    EtE = EtE.swapaxes(1, 2).reshape(n_predictors * n_atoms, n_predictors * n_atoms) / n
+    return bbt, bE, EtE
+
+
 def _myinv(x):
     """Computes inverse
 
@@ -232,13 +465,15 @@ def _compute_gamma_i(z, x):
     array of shape (dc, dc)
 
     """
-    [e, v] = linalg.eig(z)
+    # z and the inner product are symmetric; eigh gives orthogonal eigenvectors also for
+    # repeated eigenvalues
+    [e, v] = linalg.eigh(z)
     e = e.real
     e[e < 0] = 0
     temp = np.dot(x.T, v)
     temp = np.real(np.dot(temp.conj().T, temp))
     e = np.sqrt(e)
-    [d, u] = linalg.eig((temp * e) * e[:, np.newaxis])
+    [d, u] = linalg.eigh((temp * e) * e[:, np.newaxis])
     d = d.real
     d[d < 0] = 0
     d = np.sqrt(d)
@@ -273,6 +508,183 @@ def _compute_gamma_ip(z, x, gamma):
     return
 
 
+def _closed_form_gamma(gamma, ytilde, lhat, dc, scalar=False):
+    """Champagne update of diagonal source covariances, for all sources at once
+
+    With diagonal Gamma_i, every diagonal element has the closed form update of the fixed
+    orientation case, gamma_j = ||x_j|| / sqrt(z_j) with x_j = gamma_j * lhat_j' ytilde and
+    z_j = lhat_j' lhat_j; with Gamma_i = gamma_i * I, gamma_i = ||X_i||_F / sqrt(tr(Z_i)).
+
+    Parameters
+    ----------
+    gamma: ndarray
+        array of shape (N * dc,), diagonal elements of the current Gamma_i
+    ytilde: ndarray
+        array of shape (K, K), whitened square root of the residual covariance
+    lhat: ndarray
+        array of shape (K, N * dc), whitened lead-field
+    dc: int
+        orientation components per source
+    scalar: bool
+        update Gamma_i = gamma_i * I instead of diagonal Gamma_i
+
+    Returns
+    -------
+    ndarray
+    array of shape (N * dc,)
+    """
+    x = gamma * np.sqrt((np.dot(ytilde.T, lhat) ** 2).sum(axis=0))
+    z = (lhat ** 2).sum(axis=0)
+    if scalar:
+        x = np.repeat(np.sqrt((x.reshape((-1, dc)) ** 2).sum(axis=1)), dc)
+        z = np.repeat(z.reshape((-1, dc)).sum(axis=1), dc)
+    return x / np.sqrt(z)
+
+
+def _complete_checkpoint(path):
+    """Locates the most recent complete checkpoint written by ``DstRF._save_checkpoint``
+
+    The state file is written last, so its presence marks a complete checkpoint.
+    """
+    for path_ in (path, path + '.tmp'):
+        if os.path.exists(os.path.join(path_, 'state.pickled')):
+            return path_
+    return None
+
+
+def _solve_lower(L, b, out=None, trans=False):
+    """Solves ``L x = b`` (or ``L' x = b``) for lower triangular ``L``
+
+    Parameters
+    ----------
+    L: ndarray
+        lower triangular array of shape (K, K)
+    b: ndarray
+        array of shape (K, M)
+    out: ndarray, optional
+        Fortran-ordered array of shape (K, M), the solution is computed in place in this array.
+    trans: bool
+        solve ``L' x = b`` instead.
+
+    Returns
+    -------
+    ndarray
+    x, of shape (K, M)
+    """
+    if out is None:
+        out = np.array(b, order='F')
+    else:
+        out[...] = b
+    return linalg.solve_triangular(L, out, trans=1 if trans else 0, lower=True, overwrite_b=True,
+                                   check_finite=False)
+
+
+class _Factors:
+    "Cholesky factor of one trial's Sigma_b, and quantities whitened with it"
+    __slots__ = ('sigma_b', 'L', 'lead_field', 'slot', 'data_token', 'bE', 'bbt')
+
+    def __init__(self, sigma_b):
+        self.sigma_b = sigma_b
+        self.L = linalg.cholesky(sigma_b, lower=True)
+        self.lead_field = self.slot = self.data_token = self.bE = self.bbt = None
+
+
+class _GramCache:
+    """Gram matrices ``L_n' L_n`` of the whitened lead-fields of all trials, for rows of theta
+
+    Blocks are computed only for rows that were not requested before, so that the cost of
+    following a slowly changing support is proportional to the rows entering it. When more than
+    ``max_rows`` rows would be needed, the cache starts over with the requested rows.
+
+    Parameters
+    ----------
+    leadfields: ndarray
+        array of shape (N * dc, n_trials, K), the stacked whitened lead-fields
+    max_rows: int
+        number of rows to keep Gram matrices for
+    """
+
+    def __init__(self, leadfields, max_rows):
+        self.leadfields = leadfields
+        self.max_rows = max_rows
+        self.n = 0
+        self._position = np.full(leadfields.shape[0], -1)
+        self._rows = self._grams = None
+
+    def get(self, rows):
+        "Gram matrices of shape (n_trials, len(rows), len(rows)) for ``rows`` of theta"
+        if self._grams is None:
+            self._rows = np.empty(self.max_rows, int)
+            self._grams = np.empty((self.leadfields.shape[1], self.max_rows, self.max_rows))
+        new = rows[self._position[rows] < 0]
+        if len(new):
+            if self.n + len(new) > self.max_rows:
+                self._position[self._rows[:self.n]] = -1
+                self.n = 0
+                new = rows
+            self._add(new)
+        index = self._position[rows]
+        return self._grams[:, index[:, np.newaxis], index]
+
+    def _add(self, new):
+        start, stop = self.n, self.n + len(new)
+        self._rows[start:stop] = new
+        self._position[new] = np.arange(start, stop)
+        # (n_trials, n_new, K) x (n_trials, K, n_rows)
+        block = np.matmul(self.leadfields[new].transpose(1, 0, 2),
+                          self.leadfields[self._rows[:stop]].transpose(1, 2, 0))
+        self._grams[:, start:stop, :stop] = block
+        self._grams[:, :start, start:stop] = block[:, :, :start].transpose(0, 2, 1)
+        self.n = stop
+
+
+class _TrialBuffer:
+    """Growable storage for the (un-normalized) data of a single trial
+
+    Capacity is doubled whenever it is exhausted, so that appending a chunk costs amortized
+    time proportional to the chunk length.
+    """
+
+    def __init__(self, meg, covariates):
+        self.n = meg.shape[1]
+        self._meg = np.array(meg, order='F')
+        self._covariates = np.array(covariates)
+
+    def extend(self, meg, covariates):
+        n = self.n + meg.shape[1]
+        if n > self._meg.shape[1]:
+            capacity = max(n, 2 * self._meg.shape[1])
+            buf = np.empty((self._meg.shape[0], capacity), order='F')
+            buf[:, :self.n] = self._meg[:, :self.n]
+            self._meg = buf
+            buf = np.empty((capacity, self._covariates.shape[1]))
+            buf[:self.n] = self._covariates[:self.n]
+            self._covariates = buf
+        self._meg[:, self.n:n] = meg
+        self._covariates[self.n:n] = covariates
+        self.n = n
+
+    @property
+    def meg(self):
+        return self._meg[:, :self.n]
+
+    @property
+    def covariates(self):
+        return self._covariates[:self.n]
+
+
+class _LazyCovariates(dict):
+    "Covariate matrices of :class:`REG_Data` with ``statistics='fft'``, formed when first accessed"
+
+    def __init__(self, data):
+        dict.__init__(self)
+        self._data = data
+
+    def __missing__(self, key):
+        value = self[key] = self._data._covariates(self._data._stim[key])
+        return value
+
+
 class REG_Data:
     """Data Container for regression problem
 
@@ -281,39 +693,79 @@ class REG_Data:
         filter_length: int
             TRF length in time bins, used to construct the Gabor basis.
 
+        memory_limit: int, optional
+            bound (bytes) for temporary arrays: lagged copies of the stimulus are formed for
+            chunks of time points whose lag matrices fit in this limit, and time slices for
+            :meth:`DstRF.fit` with ``idx`` are reduced to their sufficient statistics in chunks
+            instead of being copied whenever the copies would exceed it.
+
+        statistics: 'direct' | 'fft'
+            how the sufficient statistics (bb', bE, E'E) of loaded trials are computed: as
+            products of the covariate matrices, or from FFT-based auto- and cross-correlations
+            of stimulus and meg data up to lag ``filter_length``. With ``'fft'``, covariate
+            matrices are only formed when they are accessed (e.g., for :meth:`timeslice`).
+
+        basis: ndarray, optional
+            array of shape (filter_length, n_atoms) onto which the lagged stimulus is
+            projected (default: ``filter_length - 1`` Gabor atoms, see :func:`gaussian_basis`).
+            The TRF coefficients (``DstRF.theta``) have ``n_atoms`` columns per predictor, so a
+            basis with fewer atoms trades temporal resolution for faster fits.
+
     Returns
     -------
         an instance of REG_Data
     """
     _n_predictor_variables = 1
 
-    def __init__(self, filter_length=200):
+    def __init__(self, filter_length=200, memory_limit=None, statistics='direct', basis=None):
+        if statistics not in ('direct', 'fft'):
+            raise ValueError("statistics=%r; needs to be 'direct' or 'fft'" % (statistics,))
         self.filter_length = filter_length
-        x = np.linspace(5, 1000, self.filter_length)
-        self.basis = gaussian_basis(self.filter_length, x)
-        self.covariates = dict()
+        self.memory_limit = memory_limit
+        self.statistics = statistics
+        if basis is None:
+            x = np.linspace(5, 1000, self.filter_length)
+            basis = gaussian_basis(self.filter_length, x)
+        elif basis.ndim != 2 or basis.shape[0] != filter_length:
+            raise ValueError("basis needs to have shape (filter_length, n_atoms), got %s" %
+                             (basis.shape,))
+        self.basis = basis
+        self.covariates = _LazyCovariates(self) if statistics == 'fft' else dict()
         self.meg = dict()
         self.datakeys = []
         self.tstep = None
-        self._norm_factor = None
-
-    def load(self, key, meg, stim, normalize_regresor=False):
+        self._norm_factors = dict()  # sqrt(number of time points) the trials are divided by
+        self._bbt = None
+        self._token = object()  # replaced whenever the sufficient statistics change
+        self._stim_tail = dict()
+        self._buffers = dict()
+        self._stale = set()
+        self._stim = dict()
+        self._trial_statistics = dict()
+
+    def load(self, key, meg, stim, normalize_regresor=False, tstep=None):
         """method to load data into REG data instrince
 
         Parameters
         ----------
             key: string|tuple
                 dictionary key
-            meg: NDVar
-                meg data
-            stim: NDVar
-                stimulus/ regressor/ predictor variable
+            meg: NDVar | ndarray
+                meg data, array of shape (K, T)
+            stim: NDVar | ndarray
+                stimulus/ regressor/ predictor variable, array of shape (T,) or (n_predictors, T)
             normalize_regresor: Boolean
                 if True normalizes the regressor/ predictor. Will suggest to normalize data
                 manually. This functionality is not fully working.
+            tstep: float
+                sampling interval (s) of array data (NDVars provide their own)
         Returns
         -------
             data loaded instance of REG_Data
+
+        Notes
+        -----
+        float64 arrays are used without copying, other than for storing the normalized data.
         """
         # check if time lengths are same or not
         # skip for now
@@ -321,38 +773,136 @@ class REG_Data:
         self.datakeys.append(key)
 
         if self.tstep is None:
-            self.tstep = meg.time.tstep
+            if tstep is None and hasattr(meg, 'time'):
+                tstep = meg.time.tstep
+            self.tstep = tstep
 
         # add meg data
-        y = meg.get_data(('sensor', 'time'))
-        y = y[:, self.basis.shape[0]-1:].astype(np.float64)
+        y = _meg_data(meg)
+        y = y[:, self.basis.shape[0]-1:]
         self.meg[key] = y / sqrt(y.shape[1])  # Mind the normalization
-
-        if self._norm_factor is None:
-            self._norm_factor = sqrt(y.shape[1])
+        self._norm_factors[key] = sqrt(y.shape[1])
 
         # add corresponding covariate matrix
-        covariates = np.dot(covariate_from_stim(stim, self.filter_length, normalize=normalize_regresor),
-                            self.basis) / sqrt(y.shape[1])  # Mind the normalization
-        if covariates.ndim > 2:
-            self._n_predictor_variables = covariates.shape[0]
-            covariates = covariates.swapaxes(1, 0)
+        w = _stim_data(stim)
+        if normalize_regresor:
+            w = _normalize_stim(w)
+        self._n_predictor_variables = w.shape[0]
+        if self.statistics == 'fft':
+            self._stim[key] = w
+            self._trial_statistics[key] = _fft_statistics(y, w, self.filter_length, self.basis)
+        else:
+            self.covariates[key] = self._covariates(w)
+
+        # keep the stimulus history needed to continue this trial with `append`
+        w = _stim_data(stim)
+        self._stim_tail[key] = w[:, w.shape[1] - (self.filter_length - 1):]
+
+        if self._bbt is not None:
+            bbt, bE, EtE = self._statistics(key)
+            self._bbt.append(bbt)
+            self._bE.append(bE)
+            self._EtE.append(EtE)
+            self._token = object()
+
+        return self
+
+    def append(self, key, meg, stim, tstep=None):
+        """Appends a chunk of a recording in progress
+
+        Sufficient statistics of the trial are updated in place, so that the cost of an update
+        is proportional to the length of the chunk rather than to the length of the whole
+        recording. The first chunk of a trial is handled by :meth:`load`, and has to be longer
+        than ``filter_length``.
 
-        first_dim = covariates.shape[0]
-        self.covariates[key] = covariates.reshape(first_dim, -1).astype(np.float64)
+        Parameters
+        ----------
+            key: string|tuple
+                dictionary key
+            meg: NDVar | ndarray
+                meg data of the new chunk
+            stim: NDVar | ndarray
+                stimulus/ regressor/ predictor variable for the same time points
+            tstep: float
+                sampling interval (s) of array data (NDVars provide their own)
+        Returns
+        -------
+            updated instance of REG_Data
+        """
+        if key not in self.meg:
+            return self.load(key, meg, stim, tstep=tstep)
+
+        w = np.concatenate((self._stim_tail[key], _stim_data(stim)), axis=1)
+        self._stim_tail[key] = w[:, w.shape[1] - (self.filter_length - 1):]
+
+        y = _meg_data(meg)
+        covariates = _lagged_projection(w, self.filter_length, self.basis, self._chunk_size(w.shape[0]))
+        covariates = covariates.swapaxes(1, 0).reshape(y.shape[1], -1)
+
+        if key not in self._buffers:
+            # switch the trial over to un-normalized, growable storage
+            n = self.meg[key].shape[1]
+            self._buffers[key] = _TrialBuffer(self.meg[key] * sqrt(n), self.covariates[key] * sqrt(n))
+        buffer = self._buffers[key]
+        n_old = buffer.n
+        buffer.extend(y, covariates)
+        self._norm_factors[key] = sqrt(buffer.n)
+        self._stale.add(key)
+
+        if self._bbt is not None:
+            trial = self.datakeys.index(key)
+            self._bbt[trial] = (self._bbt[trial] * n_old + np.dot(y, y.T)) / buffer.n
+            self._bE[trial] = (self._bE[trial] * n_old + np.dot(y, covariates)) / buffer.n
+            self._EtE[trial] = (self._EtE[trial] * n_old + np.dot(covariates.T, covariates)) / buffer.n
+            self._token = object()
 
         return self
 
+    def _covariates(self, w):
+        "Normalized covariate matrix of shape (T - M + 1, n_predictors * n_atoms)"
+        covariates = _lagged_projection(w, self.filter_length, self.basis, self._chunk_size(w.shape[0]))
+        covariates /= sqrt(covariates.shape[1])  # Mind the normalization
+        return covariates.swapaxes(1, 0).reshape(covariates.shape[1], -1)
+
+    def _statistics(self, key):
+        "Sufficient statistics bb', bE and E'E of one trial"
+        if key in self._trial_statistics and key not in self._buffers:
+            return self._trial_statistics[key]
+        b, E = self.meg[key], self.covariates[key]
+        return np.dot(b, b.T), np.dot(b, E), np.dot(E.T, E)
+
+    def _chunk_size(self, n_predictors):
+        "Number of time points whose lag matrices fit into ``memory_limit``"
+        if self.memory_limit is None:
+            return None
+        # _lag_matrix holds two copies of the lagged stimulus
+        return max(1, self.memory_limit // (2 * 8 * n_predictors * self.filter_length))
+
+    def _refresh(self):
+        "Brings normalized data of trials extended with `append` up to date"
+        for key in self._stale:
+            buffer = self._buffers[key]
+            self.meg[key] = buffer.meg / sqrt(buffer.n)
+            self.covariates[key] = buffer.covariates / sqrt(buffer.n)
+        self._stale.clear()
+
     def _precompute(self):
+        if self._bbt is not None and not self.meg:
+            # an instance holding only statistics (see _with_statistics)
+            return
+        self._token = object()
         self._bbt = []
         self._bE = []
         self._EtE = []
-        for b, E, _ in self:
-            self._bbt.append(np.dot(b, b.T))
-            self._bE.append(np.dot(b, E))
-            self._EtE.append(np.dot(E.T, E))
+        self._refresh()
+        for key in self.datakeys:
+            bbt, bE, EtE = self._statistics(key)
+            self._bbt.append(bbt)
+            self._bE.append(bE)
+            self._EtE.append(EtE)
 
     def __iter__(self):
+        self._refresh()
         return ((self.meg[key], self.covariates[key], key) for key in self.datakeys)
 
     def __len__(self):
@@ -361,6 +911,63 @@ class REG_Data:
     def __repr__(self):
         return 'Regression data'
 
+    def _with_statistics(self, keys, bbt, bE, EtE, sources=None):
+        """New instance holding only the given sufficient statistics
+
+        The result can be used for fitting, but not iterated over, since it contains no data.
+        ``sources`` are the keys of the trials in this instance that the new trials are
+        derived from, and whose normalization they share (default: ``keys``).
+        """
+        if sources is None:
+            sources = keys
+        regdata_ = REG_Data(self.filter_length, self.memory_limit, basis=self.basis)
+        regdata_.tstep = self.tstep
+        regdata_._n_predictor_variables = self._n_predictor_variables
+        regdata_._norm_factors = {key: self._norm_factors[source]
+                                  for key, source in zip(keys, sources)}
+        regdata_.datakeys = list(keys)
+        regdata_._bbt = list(bbt)
+        regdata_._bE = list(bE)
+        regdata_._EtE = list(EtE)
+        return regdata_
+
+    def _timeslice_statistics(self, idx):
+        """Sufficient statistics of :meth:`timeslice`, computed in chunks without copying the data
+
+        Returns
+        -------
+            REG_Data instance holding only sufficient statistics (see :meth:`_with_statistics`)
+        """
+        self._refresh()
+        idx = np.arange(self.meg[self.datakeys[0]].shape[1])[idx]
+        n_sensors = self.meg[self.datakeys[0]].shape[0]
+        n_columns = self._n_predictor_variables * self.basis.shape[1]
+        chunk_size = max(1, self.memory_limit // (8 * (n_sensors + n_columns)))
+        bbts, bEs, EtEs = [], [], []
+        for key in self.datakeys:
+            scale = self._norm_factors[key] / sqrt(len(idx))
+            bbt = bE = EtE = 0
+            for start in range(0, len(idx), chunk_size):
+                index = idx[start:start + chunk_size]
+                b = self.meg[key][:, index] * scale
+                E = self.covariates[key][index] * scale
+                bbt = bbt + np.dot(b, b.T)
+                bE = bE + np.dot(b, E)
+                EtE = EtE + np.dot(E.T, E)
+            bbts.append(bbt)
+            bEs.append(bE)
+            EtEs.append(EtE)
+        regdata_ = self._with_statistics(self.datakeys, bbts, bEs, EtEs)
+        regdata_._norm_factors = dict.fromkeys(self.datakeys, sqrt(len(idx)))
+        return regdata_
+
+    def _timeslice_size(self, idx):
+        "Bytes :meth:`timeslice` allocates for copies of the data"
+        n_times = len(np.arange(self.meg[self.datakeys[0]].shape[1])[idx])
+        n_columns = self._n_predictor_variables * self.basis.shape[1]
+        n = sum(self.meg[key].shape[0] + n_columns for key in self.datakeys)
+        return 8 * n_times * n
+
     def timeslice(self, idx):
         """gets a time slice (used for cross-validation
 
@@ -371,14 +978,16 @@ class REG_Data:
         -------
             REG_Data instance
         """
-        regdata_ = REG_Data(self.filter_length)
+        self._refresh()
+        regdata_ = REG_Data(self.filter_length, self.memory_limit, basis=self.basis)
         regdata_.datakeys = self.datakeys
         regdata_._n_predictor_variables = self._n_predictor_variables
         regdata_.tstep = self.tstep
-        regdata_._norm_factor = sqrt(len(idx))
+        regdata_._norm_factors = dict.fromkeys(self.datakeys, sqrt(len(idx)))
         for key in regdata_.datakeys:
-            regdata_.meg[key] = self.meg[key][:, idx] * self._norm_factor / regdata_._norm_factor
-            regdata_.covariates[key] = self.covariates[key][idx, :] * self._norm_factor / regdata_._norm_factor
+            scale = self._norm_factors[key] / regdata_._norm_factors[key]
+            regdata_.meg[key] = self.meg[key][:, idx] * scale
+            regdata_.covariates[key] = self.covariates[key][idx, :] * scale
             # Take care of the normalization too
 
         return regdata_
@@ -391,14 +1000,16 @@ class DstRF:
 
     Parameters
     ----------
-    lead_field: NDVar
-        array of shape (K, N)
+    lead_field: NDVar | ndarray
+        array of shape (K, N), or (K, N, 3) for free orientation
         lead-field matrix.
         both fixed or free orientation lead-field vectors can be used.
 
     orientation: 'fixed'|'free'
         'fixed': orientation-constrained lead-field matrix.
         'free': free orientation lead-field matrix.
+        Only needed for array lead-fields of shape (K, N * 3) with free orientation, otherwise
+        inferred from the lead-field.
 
     noise_covariance: ndarray
         array of shape (K, K)
@@ -417,6 +1028,28 @@ class DstRF:
         number of inner FASTA iterations
         default is 100
 
+    lead_field_scaling: float, optional
+        indicates that ``lead_field`` is an array that is already divided by this factor (its
+        spectral norm). Such a lead-field is used as is, without copying, which allows models
+        to share one read-only lead-field buffer.
+
+    memory_limit: int, optional
+        memory (bytes) fitting should stay within. If the estimate of :meth:`estimate_memory`
+        exceeds it, the whitened lead-fields are not stored for every trial, but re-derived
+        from the Cholesky factors with triangular solves whenever they are needed. A
+        ``RuntimeWarning`` is issued if even that is estimated to exceed the limit.
+
+    source_covariance: 'full' | 'diagonal' | 'scalar'
+        model of the source covariances Gamma_i for free orientation: 'full' (3 x 3 matrices)
+        or the cheaper, approximate 'diagonal' and 'scalar' (multiple of the identity) models,
+        whose Champagne updates have a closed form and skip the eigendecompositions. A fit
+        with either can serve as a warm start for the full model (see :meth:`partial_fit`).
+
+    gap_tol: float, optional
+        stop the inner FASTA iterations as soon as the duality gap certifies a relative
+        accuracy of ``gap_tol`` for the objective (default: FASTA's residual rule, which often
+        runs all ``n_iterf`` iterations).
+
     Attributes
     ----------
     Gamma: dict of lists
@@ -425,36 +1058,227 @@ class DstRF:
     sigma_b: dict of ndarray of shape (K, K)
         data covariance under the model
 
+    memory_: dict
+        only with ``memory_limit``: the ``'limit'``, the ``'estimate'`` and the measured
+        ``'peak'`` (bytes) of memory allocated during the last fit (only measured with
+        ``profile='memory'``, otherwise ``None``), and whether whitened lead-fields were
+        ``'streamed'``.
+
 
     """
     _n_predictor_variables = 1
+    _streaming = False
+    memory_limit = None
+    gap_tol = None
+    source_covariance = 'full'
+
+    def __init__(self, lead_field, noise_covariance, n_iter=30, n_iterc=10, n_iterf=100,
+                 orientation=None, lead_field_scaling=None, memory_limit=None, gap_tol=None,
+                 source_covariance='full'):
+        if source_covariance not in ('full', 'diagonal', 'scalar'):
+            raise ValueError("source_covariance=%r; needs to be 'full', 'diagonal' or 'scalar'" %
+                             (source_covariance,))
+        if hasattr(lead_field, 'get_data'):
+            if lead_field.has_dim('space'):
+                x = lead_field.get_data(dims=('sensor', 'source', 'space'))
+                self.space = lead_field.space
+            else:
+                x = lead_field.get_data(dims=('sensor', 'source'))
+            self.source = lead_field.source
+            self.sensor = lead_field.sensor
+        else:
+            x = lead_field
+            self.source = self.sensor = self.space = None
 
-    def __init__(self, lead_field, noise_covariance, n_iter=30, n_iterc=10, n_iterf=100):
-        if lead_field.has_dim('space'):
-            self.lead_field = lead_field.get_data(dims=('sensor', 'source', 'space')).astype(np.float64)
-            self.sources_n = self.lead_field.shape[1]
-            self.lead_field = self.lead_field.reshape(self.lead_field.shape[0], -1)
+        x = np.asarray(x, dtype=np.float64)
+        if x.ndim == 3 or orientation == 'free':
+            self.sources_n = x[0].size // 3
             self.orientation = 'free'
-            self.space = lead_field.space
         else:
-            self.lead_field = lead_field.get_data(dims=('sensor', 'source')).astype(np.float64)
-            self.sources_n = self.lead_field.shape[1]
+            self.sources_n = x.shape[1]
             self.orientation = 'fixed'
+        self.lead_field = x.reshape(x.shape[0], -1)
 
-        self.lead_field_scaling = linalg.norm(self.lead_field, 2)
-        self.lead_field /= self.lead_field_scaling
+        if lead_field_scaling is None:
+            self.lead_field_scaling = linalg.norm(self.lead_field, 2)
+            # a new array, so that the caller's lead-field is never modified
+            self.lead_field = self.lead_field / self.lead_field_scaling
+        else:
+            self.lead_field_scaling = lead_field_scaling
 
-        self.source = lead_field.source
-        self.sensor = lead_field.sensor
-        self.noise_covariance = noise_covariance.astype(np.float64)
+        self.noise_covariance = np.asarray(noise_covariance, dtype=np.float64)
         self.n_iter = n_iter
         self.n_iterc = n_iterc
         self.n_iterf = n_iterf
+        self.memory_limit = memory_limit
+        self.gap_tol = gap_tol
+        self.source_covariance = source_covariance
 
         self.__init__vars()
         self._init_Sigma_b = None
         self._init_Gamma = None
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_buffers', None)
+        state.pop('_factor_cache', None)
+        if isinstance(self.lead_field, np.memmap) and self.lead_field.filename is not None:
+            # workers re-open the shared file instead of receiving a copy
+            state['lead_field'] = None
+            state['_lead_field_file'] = self.lead_field.filename
+        return state
+
+    def __setstate__(self, state):
+        filename = state.pop('_lead_field_file', None)
+        self.__dict__.update(state)
+        if filename is not None:
+            self.lead_field = np.load(filename, mmap_mode='r')
+
+    def share_lead_field(self, path):
+        """Moves the whitened, scaled lead-field into a read-only memory-mapped file
+
+        Models derived with :meth:`copy` reference the same file, and when the model is pickled
+        (e.g., to be sent to a worker process), only the file name is transferred. Place ``path``
+        on a memory file system (e.g., ``/dev/shm``) for shared memory between processes.
+        The file is only shared with processes on the same machine: :meth:`fit_distributed`
+        shares it with workers started by :func:`local_workers`, and sends the contents of
+        the lead-field to all other workers.
+
+        Parameters
+        ----------
+            path: str
+                ``.npy`` file name for the lead-field
+        """
+        if not path.endswith('.npy'):
+            path += '.npy'
+        np.save(path, self.lead_field)
+        self.lead_field = np.load(path, mmap_mode='r')
+        return self
+
+    def copy(self):
+        """New model without fitted state that shares lead-field and noise covariance with this one
+
+        Returns
+        -------
+            DstRF instance
+        """
+        model = DstRF.__new__(DstRF)
+        for attr in ('lead_field', 'lead_field_scaling', 'sources_n', 'orientation', 'source',
+                     'sensor', 'space', 'noise_covariance', 'eta', 'init_sigma_b', 'n_iter',
+                     'n_iterc', 'n_iterf', 'memory_limit', 'gap_tol', 'source_covariance'):
+            if hasattr(self, attr):
+                setattr(model, attr, getattr(self, attr))
+        model._init_Sigma_b = None
+        model._init_Gamma = None
+        return model
+
+    def _factors(self, key):
+        """Cached Cholesky factor of ``Sigma_b[key]``
+
+        Entries are tied to the ``Sigma_b[key]`` array they were computed from; since
+        :meth:`_solve` replaces rather than modifies ``Sigma_b`` arrays, a new array
+        invalidates the entry.
+        """
+        cache = self.__dict__.setdefault('_factor_cache', {})
+        sigma_b = self.Sigma_b[key]
+        factors = cache.get(key)
+        if factors is None or factors.sigma_b is not sigma_b:
+            factors = cache[key] = _Factors(sigma_b)
+        return factors
+
+    def _whitened_lead_field(self, trial, factors, out=None):
+        """L^-1 G for the trial, computed once per factor in the trial's slice of the stacked buffer
+
+        When streaming, it is recomputed on every call, in ``out`` if provided; otherwise,
+        ``out`` serves as scratch space for the triangular solve."""
+        if self._streaming:
+            return _solve_lower(factors.L, self.lead_field, out)
+        stack = self._whitened_buffers(len(self.keys))
+        stale = factors.lead_field is None or factors.lead_field.base is not stack
+        if stale or factors.slot != trial:
+            factors.lead_field = stack[:, trial, :].T
+            factors.lead_field[...] = _solve_lower(factors.L, self.lead_field, out)
+            factors.slot = trial
+        return factors.lead_field
+
+    def _whiten_data(self, trial, factors, data):
+        "L^-1 bE and trace(L^-1 bb' L^-T) for the trial, computed once per factor and data"
+        if factors.data_token is not data._token:
+            factors.bE = _solve_lower(factors.L, data._bE[trial])
+            factors.bbt = np.trace(_solve_lower(factors.L, _solve_lower(factors.L, data._bbt[trial]).T))
+            factors.data_token = data._token
+
+    def _whitened_buffers(self, n):
+        """Preallocated array of shape (N * dc, n, K) for the whitened lead-fields of ``n`` trials
+
+        ``[:, trial, :].T`` is the (K, N * dc) whitened lead-field of ``trial``; reshaped to
+        (N * dc, n * K), the array holds the lead-fields of all trials stacked along the sensor
+        axis, so that products with all of them are single matrix products.
+        """
+        buffers = self.__dict__.get('_buffers')
+        if buffers is None or buffers.shape[1] != n:
+            k, m = self.lead_field.shape
+            buffers = self._buffers = np.empty((m, n, k))
+        return buffers
+
+    def estimate_memory(self, data, streaming=False):
+        """Estimated memory (bytes) allocated while fitting the model to ``data``
+
+        Parameters
+        ----------
+            data: REG_Data instance
+            streaming: Boolean
+                estimate for a fit that does not store the whitened lead-field of every trial
+
+        Returns
+        -------
+            int
+        """
+        n_trials = len(data.datakeys)
+        n_sensors, n_coefs = self.lead_field.shape
+        n_columns = data._n_predictor_variables * data.basis.shape[1]
+        dc = orientation[self.orientation]
+        n_workers = get_parallelism().split(n_trials)[0]
+        lead_field = n_sensors * n_coefs
+        # Sigma_b and its Cholesky factor, whitened bE, Gamma
+        per_trial = 2 * n_sensors ** 2 + n_sensors * n_columns + self.sources_n * dc ** 2
+        # FASTA iterates, gradients and their temporaries (for all trials at once, unless
+        # streaming)
+        n_batch = n_workers if streaming else n_trials
+        fasta = 8 * n_coefs * n_columns + 4 * n_batch * n_sensors * n_columns
+        # whitened lead-field and Sigma_b within each Champagne worker, and a lead-field sized
+        # temporary for the closed form (diagonal Gamma) updates
+        n_lead_fields = 1 if dc == 3 and self.source_covariance == 'full' else 2
+        champagne = n_workers * (n_lead_fields * lead_field + 2 * n_sensors ** 2)
+        if streaming:
+            stored = n_workers * lead_field
+        else:
+            # stacked lead-fields and a scratch lead-field, stacked bE and E'E of all trials,
+            # Gram matrices of the lead-fields for up to K rows of theta
+            stored = ((n_trials + 1) * lead_field + n_trials * (n_sensors + n_columns) * n_columns +
+                      n_trials * n_sensors ** 2)
+        return 8 * (n_trials * per_trial + fasta + champagne + stored)
+
+    def _plan_memory(self, data):
+        "Decides whether to stream whitened lead-fields, to stay within ``memory_limit``"
+        if self.memory_limit is None:
+            self._streaming = False
+            return None
+        estimate = self.estimate_memory(data)
+        streaming = estimate > self.memory_limit
+        if streaming:
+            estimate = self.estimate_memory(data, streaming)
+            if estimate > self.memory_limit:
+                warnings.warn("Fitting needs an estimated %.1f MB even with streamed lead-fields, "
+                              "more than memory_limit=%.1f MB" %
+                              (estimate / 1e6, self.memory_limit / 1e6), RuntimeWarning)
+        if streaming != self._streaming:
+            # cached factors hold whitened lead-fields in the stored mode only
+            self.__dict__.pop('_factor_cache', None)
+            self.__dict__.pop('_buffers', None)
+        self._streaming = streaming
+        return estimate
+
     def __init__vars(self):
         wf = linalg.cholesky(self.noise_covariance, lower=True)
         Gtilde = linalg.solve(wf, self.lead_field)
@@ -486,7 +1310,7 @@ class DstRF:
         data._precompute()
         return self
 
-    def _solve(self, data, theta, use_optimized=True, **kwargs):
+    def _solve(self, data, theta, use_optimized=True, stats=NO_STATS, workers=SERIAL, **kwargs):
         """Champagne steps implementation
 
         Parameters
@@ -500,31 +1324,63 @@ class DstRF:
                 use this flag to select between C implemenatation and pure numpy
                 implementation of the compute_gamma_i funtions. By default, uses the optimized
                 C versions.
+
+            stats: FitStats instance
+                records time spent in the gamma kernels.
+
+            workers: map over trials (see :meth:`Parallelism.workers`)
+                trials are independent and are solved in parallel.
         """
         # Choose dc
         dc = orientation[self.orientation]
 
-        idx = kwargs.get('idx', slice(None, None))
-
         n_iterc = kwargs.get('n_iterc', self.n_iterc)
 
         use_optimized = kwargs.get('use_optimized', use_optimized)
 
-        for meg, covariates, key in data:
-            meg = meg[idx]
-            covariates = covariates[idx]
-            y = meg - np.dot(np.dot(self.lead_field, theta), covariates.T)
-            Cb = np.dot(y, y.T)  # empirical data covariance
+        compute_gamma_ip = stats.wrap('gamma', _compute_gamma_ip)
+        compute_gamma_i = stats.wrap('gamma', _compute_gamma_i)
+        closed_form_gamma = stats.wrap('gamma', _closed_form_gamma)
+        # 1 x 1 Gamma_i are diagonal, too
+        diagonal = dc == 1 or self.source_covariance != 'full'
+        scalar = self.source_covariance == 'scalar'
+
+        P = np.dot(self.lead_field, theta)
+        # allocate shared caches before workers access them
+        if not self._streaming:
+            self._whitened_buffers(len(data.datakeys))
+        self.__dict__.setdefault('_factor_cache', {})
+
+        def solve_trial(trial, key):
+            lhat_buffer = np.empty(self.lead_field.shape, order='F')
+            # empirical data covariance of the residual, from the sufficient statistics:
+            # (b - L theta E')(b - L theta E')' = bb' - P (bE)' - bE P' + P E'E P'
+            PbE = np.dot(P, data._bE[trial].T)
+            Cb = data._bbt[trial] - PbE - PbE.T + np.dot(np.dot(P, data._EtE[trial]), P.T)
             yhat = linalg.cholesky(Cb, lower=True)
-            gamma = self.Gamma[key].copy()
+            if diagonal:
+                gamma = np.reshape(self.Gamma[key], (-1, dc, dc))
+                gamma = np.diagonal(gamma, axis1=1, axis2=2).ravel()
+            else:
+                gamma = self.Gamma[key].copy()
             sigma_b = self.Sigma_b[key].copy()
 
             # champagne iterations
             for it in range(n_iterc):
                 # pre-compute some useful matrices
-                Lc = linalg.cholesky(sigma_b, lower=True)
-                lhat = linalg.solve(Lc, self.lead_field)
-                ytilde = linalg.solve(Lc, yhat)
+                if it == 0:
+                    factors = self._factors(key)
+                    Lc = factors.L
+                    lhat = self._whitened_lead_field(trial, factors, lhat_buffer)
+                else:
+                    Lc = linalg.cholesky(sigma_b, lower=True)
+                    lhat = _solve_lower(Lc, self.lead_field, lhat_buffer)
+                ytilde = _solve_lower(Lc, yhat)
+
+                if diagonal:
+                    gamma = closed_form_gamma(gamma, ytilde, lhat, dc, scalar)
+                    sigma_b = self.noise_covariance + np.dot(self.lead_field * gamma, self.lead_field.T)
+                    continue
 
                 # compute sigma_b for the next iteration
                 sigma_b = self.noise_covariance.copy()
@@ -539,15 +1395,13 @@ class DstRF:
                     z = np.dot(lhat[:, i * dc:(i + 1) * dc].T, lhat[:, i * dc:(i + 1) * dc])
 
                     # update Ti
-                    if dc == 1:
-                        gamma[i] = sqrt(np.dot(x, x.T)) / np.real(sqrt(z))
-                    elif dc == 3:
+                    if dc == 3:
                         # import ipdb
                         # ipdb.set_trace()
                         if use_optimized:
-                            _compute_gamma_ip(z, x, gamma[i])
+                            compute_gamma_ip(z, x, gamma[i])
                         else:
-                            gamma[i] = _compute_gamma_i(z, x)
+                            gamma[i] = compute_gamma_i(z, x)
                     else:
                         NotImplementedError('%i x %i matrices are not implemented yet.' )
 
@@ -555,12 +1409,19 @@ class DstRF:
                     sigma_b += np.dot(self.lead_field[:, i * dc:(i + 1) * dc],
                                       np.dot(gamma[i], self.lead_field[:, i * dc:(i + 1) * dc].T))
 
+            if diagonal:
+                gamma = list(gamma.reshape((-1, dc))[:, :, np.newaxis] * np.eye(dc))
+            return gamma, sigma_b
+
+        results = workers.map(solve_trial, range(len(data.datakeys)), data.datakeys)
+        for key, (gamma, sigma_b) in zip(data.datakeys, results):
             self.Gamma[key] = gamma
             self.Sigma_b[key] = sigma_b
 
         return self
 
-    def fit(self, data, mu, tol=1e-4, verbose=False, **kwargs):
+    def fit(self, data, mu, tol=1e-4, verbose=False, checkpoint=None, checkpoint_interval=1,
+            resume=False, profile=False, callback=None, cache=None, **kwargs):
         """ estimate both TRFs and source variance from the observed MEG data by solving
         the Bayesian optimization problem mentioned in the paper.
 
@@ -581,35 +1442,249 @@ class DstRF:
             verbose: Boolean
                 If set True prints intermediate values of the cost functions.
                 by Default it is set to be False
+
+            checkpoint: str (optional)
+                directory in which the state of the fit is saved (see :meth:`save`) every
+                ``checkpoint_interval`` outer iterations.
+
+            checkpoint_interval: int (1 Default)
+                number of outer iterations between checkpoints.
+
+            resume: Boolean
+                If set True and ``checkpoint`` contains a checkpoint of a fit with the same
+                ``mu``, continue from there. The state of the random number generator is
+                restored as well, so that the result is identical to that of an
+                uninterrupted fit.
+
+            profile: Boolean | 'memory'
+                Record time spent in the different phases of the fit (see :class:`FitStats`)
+                in the ``stats_`` attribute. With ``'memory'``, also record memory allocation.
+
+            callback: callable (optional)
+                Called as ``callback(model, stats)`` after every outer iteration (implies
+                ``profile=True``).
+
+            cache: FitCache (optional)
+                If the cache holds a fit with the same lead-field, noise covariance, data,
+                ``mu``, ``tol`` and iteration settings, restore its result instead of fitting;
+                otherwise store the result of this fit in it.
+        """
+        if profile or callback is not None:
+            self.stats_ = FitStats(profile == 'memory', callback)
+        else:
+            self.stats_ = NO_STATS
+
+        try:
+            idx = kwargs.get('idx', None)
+            if idx is not None:
+                if data.memory_limit is not None and data._timeslice_size(idx) > data.memory_limit:
+                    data = data._timeslice_statistics(idx)
+                else:
+                    data = data.timeslice(idx)
+
+            self._set_mu(mu, data)
+            estimate = self._plan_memory(data)
+
+            if cache is not None:
+                cache_key = cache.fingerprint(self, data, mu, tol, **kwargs)
+                state = cache.get(cache_key)
+                if state is not None:
+                    self._set_fit_state(state)
+                    return self
+
+            self.err = []
+            if verbose:
+                self.objective_vals = []
+
+            start = 0
+            if resume and checkpoint is not None:
+                path = _complete_checkpoint(checkpoint)
+                if path is not None:
+                    state = DstRF.load(path, mmap_mode=None)
+                    if state.mu != mu or state.keys != self.keys:
+                        raise ValueError("Checkpoint at %r is from a fit to different data or with a "
+                                         "different mu" % (path,))
+                    self.theta = state.theta
+                    self.Gamma = state.Gamma
+                    self.Sigma_b = state.Sigma_b
+                    self.err = state.err
+                    if verbose:
+                        self.objective_vals = getattr(state, 'objective_vals', [])
+                    start = state._checkpoint['iteration']
+                    np.random.set_state(state._checkpoint['random_state'])
+
+            if self.memory_limit is None:
+                self._iterate(data, self.n_iter, tol, verbose, start, checkpoint, checkpoint_interval,
+                              self.stats_, **kwargs)
+            else:
+                with self.stats_.phase('fit'):
+                    self._iterate(data, self.n_iter, tol, verbose, start, checkpoint, checkpoint_interval,
+                                  self.stats_, **kwargs)
+                # the peak is only measured when memory is profiled (tracemalloc is expensive)
+                peak = self.stats_.peak_bytes['fit'] if profile == 'memory' else None
+                self.memory_ = {'limit': self.memory_limit, 'estimate': estimate,
+                                'peak': peak, 'streamed': self._streaming}
+            if cache is not None:
+                cache.put(cache_key, self._get_fit_state())
+            return self
+        finally:
+            self.stats_.close()
+
+    def _get_fit_state(self):
+        "Copy of the result of a fit, for :class:`FitCache`"
+        dc = orientation[self.orientation]
+        return {'theta': self.theta.copy(),
+                'gamma': np.array([np.reshape(self.Gamma[key], (self.sources_n, dc, dc))
+                                   for key in self.keys]),
+                'sigma_b': np.array([self.Sigma_b[key] for key in self.keys]),
+                'keys': list(self.keys),
+                'err': list(self.err),
+                'objective_vals': list(getattr(self, 'objective_vals', []))}
+
+    def _set_fit_state(self, state):
+        "Restores the result of a fit from :meth:`_get_fit_state`"
+        self.theta = state['theta'].copy()
+        # Gamma is updated in place by later fits, so the stored arrays must not be shared
+        self.Gamma = {key: list(gamma) for key, gamma in zip(state['keys'], state['gamma'].copy())}
+        self.Sigma_b = {key: sigma_b for key, sigma_b in zip(state['keys'], state['sigma_b'].copy())}
+        self.err = list(state['err'])
+        self.objective_vals = list(state['objective_vals'])
+
+    def partial_fit(self, data, mu=None, n_iter=2, tol=1e-4, verbose=False, **kwargs):
+        """Updates the estimates after new data has been added to ``data``
+
+        Runs a few outer iterations warm-started from the current ``theta`` and ``Gamma``.
+        Trials that are new to the model are initialized as in :meth:`fit`. The sufficient
+        statistics of ``data`` are computed once and afterwards kept up to date by
+        :meth:`REG_Data.load` and :meth:`REG_Data.append`, so that an update does not revisit
+        the whole recording.
+
+        Parameters
+        ----------
+            data: REG_Data instance
+                meg data and the corresponding stimulus variables
+
+            mu: float
+                regularization parameter. Defaults to the value used in the previous fit; a
+                different value restarts the estimation.
+
+            n_iter: int (2 Default)
+                number of outer iterations to run
+
+            tol: float (1e-4 Default)
+                tolerence parameter. Decides when to stop outer iterations.
+
+            verbose: Boolean
+                If set True prints intermediate values of the cost functions.
         """
-        idx = kwargs.get('idx', None)
-        if idx is not None:
-            data = data.timeslice(idx)
+        if mu is None:
+            mu = self.mu
+        if getattr(self, 'mu', None) != mu:
+            self._set_mu(mu, data)
+            self.err = []
+        else:
+            if data._bbt is None:
+                data._precompute()
+            dc = orientation[self.orientation]
+            for key in data.datakeys:
+                if key not in self.Gamma:
+                    self.Gamma[key] = [self.eta * np.eye(dc, dtype=np.float64) for _ in range(self.sources_n)]
+                    self.Sigma_b[key] = self.init_sigma_b.copy()
+            self.keys = data.datakeys.copy()
+
+        if verbose:
+            self.objective_vals = getattr(self, 'objective_vals', [])
 
-        self._set_mu(mu, data)
+        self._plan_memory(data)
+        return self._iterate(data, n_iter, tol, verbose, **kwargs)
 
-        if self.orientation == 'fixed':
-            g_funct = lambda x: g(x, self.mu)
-            prox_g = lambda x, t: shrink(x, self.mu * t)
-        elif self.orientation == 'free':
-            g_funct = lambda x: g_group(x, self.mu)
-            # prox_g = lambda x, t: proxg_group(x, self.mu * t)
-            prox_g = lambda x, t: proxg_group_opt(x, self.mu * t)
+    def fit_distributed(self, data, mu, connections, tol=1e-4, verbose=False):
+        """Like :meth:`fit`, with the trials sharded across worker processes
 
-        theta = self.theta
+        Each worker holds the sufficient statistics, ``Gamma`` and ``Sigma_b`` of its share
+        of the trials and keeps them (and the whitened lead-fields derived from them) for the
+        whole fit. At every FASTA step, the current ``theta`` is sent to all workers and the
+        objective values and gradients they return are summed; the Champagne step runs on the
+        workers. ``Gamma`` and ``Sigma_b`` are collected when the fit is done.
 
+        Parameters
+        ----------
+            data: REG_Data instance | list
+                meg data and the corresponding stimulus variables. The sufficient statistics
+                of a REG_Data instance are split among the workers. Alternatively, a list with
+                one shard per worker, each a REG_Data instance or a picklable callable
+                returning one (e.g., a :func:`functools.partial` of a function loading some
+                recordings); a worker calls the callable itself, so that the data of a shard
+                is only ever loaded and reduced to its statistics by that worker. Trial keys
+                need to be unique across shards.
+
+            mu: float
+                regularization parameter
+
+            connections: list
+                connections to the workers, with ``send()`` and ``recv()`` methods (see
+                :func:`local_workers` and :func:`connect`).
+
+            tol: float (1e-4 Default)
+                tolerence parameter. Decides when to stop outer iterations.
+
+            verbose: Boolean
+                If set True prints intermediate values of the cost functions.
+        """
+        from ._distributed import _Shards, _split_statistics
+
+        self.stats_ = NO_STATS
+        self.mu = mu
         self.err = []
         if verbose:
             self.objective_vals = []
-            start = time.time()
+        if isinstance(data, REG_Data):
+            shards = _Shards(self, _split_statistics(data, len(connections)), connections)
+            self.keys = data.datakeys.copy()
+        else:
+            shards = _Shards(self, list(data), connections)
+        self._iterate_trials(None, self.n_iter, tol, verbose, 0, None, 1, NO_STATS, SERIAL,
+                             shards=shards)
+        shards.gather()
+        return self
+
+    def _iterate(self, data, n_iter, tol, verbose, start=0, checkpoint=None, checkpoint_interval=1,
+                 stats=NO_STATS, **kwargs):
+        "Outer iterations, alternating between FASTA and Champagne steps"
+        with get_parallelism().workers(len(self.keys)) as workers:
+            return self._iterate_trials(data, n_iter, tol, verbose, start, checkpoint,
+                                        checkpoint_interval, stats, workers, **kwargs)
+
+    def _iterate_trials(self, data, n_iter, tol, verbose, start, checkpoint, checkpoint_interval,
+                        stats, workers, random_state=None, shards=None, **kwargs):
+        if shards is None:
+            construct_f = lambda: self._construct_f(data, stats, workers)
+            solve = lambda theta: self._solve(data, theta, stats=stats, workers=workers, **kwargs)
+            eval_obj = lambda: self.eval_obj(data)
+        else:
+            construct_f, solve, eval_obj = shards.construct_f, shards.solve, shards.eval_obj
+
+        penalty = _Penalty(self.mu, orientation[self.orientation])
+        g_funct = penalty.g
+        prox_g = penalty.prox
+
+        theta = self.theta
+
+        if verbose:
+            start_time = time.time()
 
         # run iterations
-        for i in (range(self.n_iter)):
+        for i in (range(start, n_iter)):
             if verbose:
                 print('iteration: %i:' % i)
-            funct, grad_funct = self._construct_f(data, **kwargs)
-            Theta = Fasta(funct, g_funct, grad_funct, prox_g, n_iter=self.n_iterf)
-            Theta.learn(theta)
+            funct, grad_funct = construct_f()
+            Theta = Fasta(funct, g_funct, grad_funct, prox_g, n_iter=self.n_iterf,
+                          random_state=random_state, dual_norm=penalty.dual_norm)
+            # without streaming, FASTA's products are single BLAS calls in this thread
+            with stats.phase('fasta'), (nullcontext() if self._streaming else workers.exclusive()):
+                Theta.learn(theta, gap_tol=self.gap_tol)
+            stats.count('fasta_iterations', len(Theta.residuals))
+            stats.count('backtracks', Theta.n_backtracks)
             # ipdb.set_trace()
 
             self.err.append(self._residual(theta, Theta.coefs_))
@@ -617,59 +1692,125 @@ class DstRF:
             self.theta = theta
 
             if verbose:
-                print('objective after fasta: %10f' % self.eval_obj(data))
+                with stats.phase('eval_obj'):
+                    print('objective after fasta: %10f' % eval_obj())
 
             if self.err[-1] < tol:
+                stats.end_iteration(self)
                 break
 
-            self._solve(data, theta, **kwargs)
+            with stats.phase('champagne'):
+                solve(theta)
 
             if verbose:
-                self.objective_vals.append(self.eval_obj(data))
+                with stats.phase('eval_obj'):
+                    self.objective_vals.append(eval_obj())
                 print("objective value after champ:{:10f}\n "
                       "%% change:{:2f}".format(self.objective_vals[-1], self.err[-1]*100))
 
+            stats.end_iteration(self)
+
+            if checkpoint is not None and (i + 1) % checkpoint_interval == 0:
+                self._save_checkpoint(checkpoint, i + 1)
+
         if verbose:
             end = time.time()
-            print("Time elapsed: {:10f} s".format(end - start))
+            print("Time elapsed: {:10f} s".format(end - start_time))
 
         return self
 
-    def _construct_f(self, data,):
+    def _construct_f(self, data, stats=NO_STATS, workers=SERIAL):
         """creates instances of objective function and its gradient to be passes to the FASTA algorithm
 
         Parameters
         ---------
-            data: RegData instance"""
-        L = [linalg.cholesky(self.Sigma_b[key], lower=True) for key in self.keys]
-        leadfields = [linalg.solve(L[trial], self.lead_field) for trial in range(len(self.keys))]
+            data: RegData instance
+            stats: FitStats instance
+            workers: map over trials (see :meth:`Parallelism.workers`), used when streaming"""
+        if self._streaming:
+            return self._construct_f_streaming(data, stats, workers)
+
+        n_trials = len(self.keys)
+        n_sensors, n_coefs = self.lead_field.shape
+        with stats.phase('construct_f'):
+            for trial, key in enumerate(self.keys):
+                factors = self._factors(key)
+                self._whitened_lead_field(trial, factors)
+                self._whiten_data(trial, factors, data)
+            factors = [self._factors(key) for key in self.keys]
+            # all trials stacked along the sensor axis: (N * dc, n_trials * K)
+            leadfields = self._whitened_buffers(n_trials).reshape((n_coefs, -1))
+            bEs = np.stack([factor.bE for factor in factors])
+            bbt = sum(factor.bbt for factor in factors)
+            EtEs = np.stack(data._EtE)
+            # for sparse x, f is evaluated in coefficient space, from the Gram matrices of the
+            # rows of the lead-fields in the support of x (at most as large as the lead-fields)
+            grams = _GramCache(self._whitened_buffers(n_trials), n_sensors)
+            LbE = None
+
+        def funct(x):
+            nonlocal LbE
+            rows = np.flatnonzero(x.any(axis=1))
+            if len(rows) > grams.max_rows:
+                Lx = np.dot(leadfields.T, x).reshape(bEs.shape)
+                return 0.5 * (bbt - 2 * np.vdot(bEs, Lx) + np.vdot(Lx, np.matmul(Lx, EtEs)))
+            stats.count('f_gram')
+            if LbE is None:
+                LbE = np.dot(leadfields, bEs.reshape((leadfields.shape[1], -1)))
+            x = x[rows]
+            quadratic = np.vdot(np.matmul(grams.get(rows), x), np.matmul(x, EtEs))
+            return 0.5 * (bbt - 2 * np.vdot(LbE[rows], x) + quadratic)
+
+        def grad_funct(x):
+            Lx = np.dot(leadfields.T, x).reshape(bEs.shape)
+            y = bEs - np.matmul(Lx, EtEs)
+            return -np.dot(leadfields, y.reshape((leadfields.shape[1], -1)))
 
-        bEs = [linalg.solve(L[trial], data._bE[trial]) for trial, key in enumerate(data.datakeys)]
-        bbts = [np.trace(linalg.solve(L[trial], linalg.solve(L[trial], data._bbt[trial]).T))
-               for trial, key in enumerate(data.datakeys)]
+        return stats.wrap('f', funct), stats.wrap('gradf', grad_funct)
 
-        def f(L, x, bbt, bE, EtE):
-            Lx = np.dot(L, x)
-            y = bbt - 2 * np.sum(inner1d(bE, Lx)) + np.sum(inner1d(Lx, np.dot(Lx, EtE)))
+    def _construct_f_streaming(self, data, stats, workers):
+        """:meth:`_construct_f` without stored whitened lead-fields
+
+        Products with the whitened lead-fields L^-1 G are split into G x, shared by all
+        trials, and per-trial triangular solves.
+        """
+        with stats.phase('construct_f'):
+            factors = [self._factors(key) for key in self.keys]
+            for trial in range(len(self.keys)):
+                self._whiten_data(trial, factors[trial], data)
+            bEs = [factor.bE for factor in factors]
+            bbts = [factor.bbt for factor in factors]
+
+        G = self.lead_field
+
+        def f(trial, Gx):
+            Lx = _solve_lower(factors[trial].L, Gx)
+            y = bbts[trial] - 2 * np.vdot(bEs[trial], Lx) + np.vdot(Lx, np.dot(Lx, data._EtE[trial]))
             return 0.5 * y
 
-        def gradf(L, x, bE, EtE):
-            y = bE - np.dot(np.dot(L, x), EtE)
-            return -np.dot(L.T, y)
+        def gradf(trial, Gx):
+            y = bEs[trial] - np.dot(_solve_lower(factors[trial].L, Gx), data._EtE[trial])
+            return _solve_lower(factors[trial].L, y, trans=True)
+
+        trials = range(len(self.keys))
 
         def funct(x):
+            Gx = np.dot(G, x)
+            fvals = workers.map(lambda trial: f(trial, Gx), trials)
             fval = 0.0
-            for trial, key in enumerate(self.keys):
-                fval += f(leadfields[trial], x, bbts[trial], bEs[trial], data._EtE[trial])
+            for val in fvals:
+                fval += val
             return fval
 
         def grad_funct(x):
-            grad = gradf(leadfields[0], x, bEs[0], data._EtE[0])
-            for trial, key in enumerate(self.keys[1:]):
-                grad += gradf(leadfields[trial+1], x, bEs[trial+1], data._EtE[trial+1])
-            return grad
+            Gx = np.dot(G, x)
+            grads = workers.map(lambda trial: gradf(trial, Gx), trials)
+            grad = grads[0]
+            for val in grads[1:]:
+                grad += val
+            return -np.dot(G.T, grad)
 
-        return funct, grad_funct
+        return stats.wrap('f', funct), stats.wrap('gradf', grad_funct)
 
     def eval_obj(self, data):
         """evaluates objective function
@@ -678,15 +1819,29 @@ class DstRF:
         ---------
             data: RegData instance
         """
+        if not data.meg:
+            return self._eval_obj_statistics(data) / len(data)
         v = 0
+        P = np.dot(self.lead_field, self.theta)
         for meg, covariate, key in data:
-            y = meg - np.dot(np.dot(self.lead_field, self.theta), covariate.T)
-            L = linalg.cholesky(self.Sigma_b[key], lower=True)
-            y = linalg.solve(L, y)
+            y = meg - np.dot(P, covariate.T)
+            L = self._factors(key).L
+            y = _solve_lower(L, y)
             v = v + 0.5 * (y ** 2).sum() + np.log(np.diag(L)).sum()
 
         return v / len(data)
 
+    def _eval_obj_statistics(self, data):
+        "Sum of the :meth:`eval_obj` terms of all trials, from the sufficient statistics"
+        v = 0
+        P = np.dot(self.lead_field, self.theta)
+        for trial, key in enumerate(data.datakeys):
+            PbE = np.dot(P, data._bE[trial].T)
+            Cb = data._bbt[trial] - PbE - PbE.T + np.dot(np.dot(P, data._EtE[trial]), P.T)
+            L = self._factors(key).L
+            v = v + 0.5 * np.trace(_solve_lower(L, _solve_lower(L, Cb).T)) + np.log(np.diag(L)).sum()
+        return v
+
     def eval_cv(self, data):
         """evaluates whole cross-validation metric (used bu CV only)
 
@@ -695,10 +1850,11 @@ class DstRF:
             data: RegData instance
         """
         v = 0
+        P = np.dot(self.lead_field, self.theta)
         for meg, covariate, key in data:
-            y = meg - np.dot(np.dot(self.lead_field, self.theta), covariate.T)
-            L = linalg.cholesky(self.Sigma_b[key], lower=True)
-            y = linalg.solve(L, y)
+            y = meg - np.dot(P, covariate.T)
+            L = self._factors(key).L
+            y = _solve_lower(L, y)
             v = v + 0.5 * (y ** 2).sum()  # + np.log(np.diag(L)).sum()
 
         return v / len(data)
@@ -711,15 +1867,16 @@ class DstRF:
             data: RegData instance
         """
         v = 0
+        P = np.dot(self.lead_field, self.theta)
         for meg, covariate, key in data:
-            y = meg - np.dot(np.dot(self.lead_field, self.theta), covariate.T)
+            y = meg - np.dot(P, covariate.T)
             # L = linalg.cholesky(self.Sigma_b[key], lower=True)
             # y = linalg.solve(L, y)
             v = v + 0.5 * (y ** 2).sum()  # + np.log(np.diag(L)).sum()
 
         return v / len(data)
 
-    def get_strf(self, data):
+    def get_strf(self, data, active_only=False, expand=True):
         """Returns the learned spatio-temporal response function as NDVar
 
 
@@ -727,39 +1884,143 @@ class DstRF:
         ---------
             data: RegData instance
 
+            active_only: Boolean
+                only return sources with non-zero TRFs.
+
+            expand: Boolean
+                If False, return the coefficients with respect to ``data.basis`` (along an
+                ``atom`` dimension) instead of expanding them into TRFs over time.
+
         Returns
         -------
             NDVar, TRFs
+            For a model constructed from an array lead-field, an ndarray with the axes of the
+            corresponding NDVar: ([predictor,] source, time) for fixed and
+            ([predictor,] time, source, space) for free orientation. With ``active_only``, a
+            ``(index, trf)`` tuple, where ``index`` contains the indices of the active sources.
         """
-        trf = self.theta.copy()
-        if data._n_predictor_variables > 1:
-            shape = (trf.shape[0], 3, -1)
-            trf.shape = shape
-            trf = trf.swapaxes(1, 0)
+        n_predictors = data._n_predictor_variables
+        dc = orientation[self.orientation]
+        trf = self.theta
+        if active_only:
+            trf = trf.reshape((self.sources_n, -1))
+            index = np.flatnonzero(np.any(trf != 0, axis=1))
+            trf = trf[index].reshape((len(index) * dc, self.theta.shape[1]))
+            n_sources = len(index)
+        else:
+            n_sources = self.sources_n
 
-        # trf = np.dot(self.basis, self.theta.T).T
-        trf = np.dot(trf, data.basis.T)
+        if n_predictors > 1:
+            trf = trf.reshape((trf.shape[0], n_predictors, trf.shape[1] // n_predictors)).swapaxes(1, 0)
 
-        time = UTS(0, data.tstep, trf.shape[-1])
+        if expand:
+            # trf = np.dot(self.basis, self.theta.T).T
+            trf = np.dot(trf, data.basis.T)
 
-        if self.orientation == 'fixed':
-            if data._n_predictor_variables > 1:
-                dims = (Case, self.source, time)
-            else:
-                dims = (self.source, time)
-            trf = NDVar(trf, dims)
+        if self.orientation == 'free':
+            trf = trf.swapaxes(-1, -2).reshape(trf.shape[:-2] + (trf.shape[-1], n_sources, 3))
+
+        if self.source is None:
+            return (index, trf) if active_only else trf
+
+        from eelbrain import Case, NDVar, Scalar, UTS
+
+        n_times = trf.shape[-1] if self.orientation == 'fixed' else trf.shape[-3]
+        if expand:
+            time = UTS(0, data.tstep, n_times)
+        else:
+            time = Scalar('atom', np.arange(n_times))
+        source = self.source[index] if active_only else self.source
 
+        if self.orientation == 'fixed':
+            dims = (source, time)
         elif self.orientation == 'free':
-            dims = (time, self.source, self.space)
-            if data._n_predictor_variables > 1:
-                trfs = []
-                for i in range(data._n_predictor_variables):
-                    trfs.append(NDVar(trf[i, :, :].T.reshape(-1, self.sources_n, 3), dims))
-                trf = combine(trfs)
+            dims = (time, source, self.space)
+        if n_predictors > 1:
+            dims = (Case,) + dims
+
+        return NDVar(trf, dims)
+
+    _array_attrs = ('lead_field', 'noise_covariance', 'init_sigma_b', 'theta')
+    _state_attrs = ('sources_n', 'orientation', 'lead_field_scaling', 'eta', 'n_iter', 'n_iterc',
+                    'n_iterf', 'memory_limit', 'gap_tol', 'source_covariance', 'mu', 'keys', 'err', 'objective_vals', 'source',
+                    'sensor', 'space', '_checkpoint')
+
+    def save(self, path):
+        """Saves the state of the model
+
+        ``path`` is a directory, in which every large array is stored as an individual ``.npy``
+        file, so that it can be memory-mapped by :meth:`load`. ``Gamma`` and ``Sigma_b`` are
+        stored as contiguous arrays of shape (n_trials, n_sources, dc, dc) and (n_trials, K, K).
+
+        Parameters
+        ----------
+            path: str
+                directory to save the model in (created if it does not exist)
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        dc = orientation[self.orientation]
+        arrays = {attr: getattr(self, attr) for attr in self._array_attrs if hasattr(self, attr)}
+        if hasattr(self, 'Gamma'):
+            arrays['gamma'] = np.array([np.reshape(self.Gamma[key], (self.sources_n, dc, dc))
+                                        for key in self.keys])
+            arrays['sigma_b'] = np.array([self.Sigma_b[key] for key in self.keys])
+        for name, x in arrays.items():
+            np.save(os.path.join(path, name + '.npy'), x)
+        state = {attr: getattr(self, attr) for attr in self._state_attrs if hasattr(self, attr)}
+        state['arrays'] = list(arrays)
+        with open(os.path.join(path, 'state.pickled'), 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Loads a model saved with :meth:`save`
+
+        Parameters
+        ----------
+            path: str
+                directory the model was saved in
+            mmap_mode: None | 'r' | 'r+' | 'c'
+                memory-map the large arrays (lead field, noise covariance, theta, Sigma_b) instead
+                of reading them, see :func:`numpy.load`. ``Gamma`` is always read into memory,
+                since it is updated in place by the Champagne steps.
+
+        Returns
+        -------
+            DstRF instance
+        """
+        with open(os.path.join(path, 'state.pickled'), 'rb') as f:
+            state = pickle.load(f)
+        self = cls.__new__(cls)
+        for name in state.pop('arrays'):
+            x = np.load(os.path.join(path, name + '.npy'), mmap_mode=None if name == 'gamma' else mmap_mode)
+            if name == 'gamma':
+                self.Gamma = {key: list(gamma) for key, gamma in zip(state['keys'], x)}
+            elif name == 'sigma_b':
+                self.Sigma_b = {key: sigma_b for key, sigma_b in zip(state['keys'], x)}
             else:
-                trf = NDVar(trf.T.reshape(-1, self.sources_n, 3), dims)
+                setattr(self, name, x)
+        self.__dict__.update(state)
+        self._init_Sigma_b = None
+        self._init_Gamma = None
+        return self
+
+    def _save_checkpoint(self, path, iteration):
+        """Saves a checkpoint after ``iteration`` outer iterations
 
-        return trf
+        The new checkpoint is written next to the old one and only swapped in once complete,
+        so that an interruption at any point leaves a usable checkpoint behind.
+        """
+        self._checkpoint = {'iteration': iteration, 'random_state': np.random.get_state()}
+        tmp_path = path + '.tmp'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        self.save(tmp_path)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+        del self._checkpoint
 
     @staticmethod
     def _residual(theta0, theta1):
@@ -786,14 +2047,63 @@ class DstRF:
             float
                 estimation stability metric
         """
-        Y = []
-        for model in models:
-            y = np.empty(0)
-            for trial, key in enumerate(data.datakeys):
-                y = np.append(y, np.dot(np.dot(model.lead_field, model.theta), data.covariates[key].T))
-            Y.append(y)
-        Y = np.array(Y)
-        Y_bar = Y.mean(axis=0)
-        VarY = (((Y - Y_bar) ** 2).sum(axis=1)).mean()
-
-        return VarY / (Y_bar ** 2).sum()
+        return DstRF.evaluate_models(models, data, cv=False)['es']
+
+    @staticmethod
+    def evaluate_models(models, data, cv=True):
+        """Estimation stability and cross-validation metrics of several models in one pass
+
+        Predictions ``lead_field . theta . E'`` of all models are computed one trial at a time and
+        reduced right away, so that only the predictions for a single trial are held in memory.
+
+        Parameters
+        ----------
+            models: list of DstRF instances
+                fitted models (e.g., fitted to different cross-validation splits)
+            data: REG_Data instance
+                data to evaluate the models on
+            cv: Boolean (Default True)
+                also compute :meth:`eval_cv` and :meth:`eval_cv1` for every model (requires
+                ``Sigma_b`` of each model for all trials in ``data``)
+
+        Returns
+        -------
+            dict
+                ``'es'``: estimation stability metric (see :meth:`compute_ES_metric`);
+                ``'cv'``, ``'cv1'``: arrays with the :meth:`eval_cv` and :meth:`eval_cv1`
+                values of each model (only with ``cv=True``).
+        """
+        P = np.array([np.dot(model.lead_field, model.theta) for model in models])
+
+        def evaluate_trial(trial):
+            meg, covariate, key = trial
+            Y = np.matmul(P, covariate.T)
+            Y_bar = Y.mean(axis=0)
+            cv_trial = np.zeros(len(models))
+            cv1_trial = np.zeros(len(models))
+            if cv:
+                for i, model in enumerate(models):
+                    y = meg - Y[i]
+                    cv1_trial[i] = 0.5 * (y ** 2).sum()
+                    y = _solve_lower(model._factors(key).L, y)
+                    cv_trial[i] = 0.5 * (y ** 2).sum()
+            return ((Y - Y_bar) ** 2).sum(), (Y_bar ** 2).sum(), cv_trial, cv1_trial
+
+        if cv:
+            for model in models:
+                model.__dict__.setdefault('_factor_cache', {})
+        var = mean_sq = 0
+        cv_vals = np.zeros(len(models))
+        cv1_vals = np.zeros(len(models))
+        with get_parallelism().workers(len(data)) as workers:
+            for var_trial, mean_sq_trial, cv_trial, cv1_trial in workers.map(evaluate_trial, data):
+                var += var_trial
+                mean_sq += mean_sq_trial
+                cv_vals += cv_trial
+                cv1_vals += cv1_trial
+
+        out = {'es': var / len(models) / mean_sq}
+        if cv:
+            out['cv'] = cv_vals / len(data)
+            out['cv1'] = cv1_vals / len(data)
+        return out
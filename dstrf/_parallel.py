@@ -0,0 +1,149 @@
+# Author: Proloy Das <proloy@umd.edu>
+"""Splitting a budget of CPU cores between parallel workers and BLAS threads"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+import os
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+# read by BLAS/ OpenMP runtimes that are loaded after they are set
+THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+
+def _available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS and Windows
+        return os.cpu_count() or 1
+
+
+class Parallelism:
+    """Budget of CPU cores, split between parallel workers and the BLAS threads of each worker
+
+    Trial-level work (the FASTA objective and gradient and the Champagne step in
+    :meth:`DstRF.fit`, :meth:`DstRF.evaluate_models`) runs in ``n_workers`` threads, each of
+    which may use ``n_cores // n_workers`` BLAS/ OpenMP threads; :func:`learn_models` splits the
+    budget the same way between its worker processes.
+
+    Parameters
+    ----------
+    n_cores: int
+        total number of cores to use (default: all cores available to the process).
+    n_workers: int
+        number of parallel workers (default: one per task, up to ``n_cores``). Limiting BLAS
+        threads requires :mod:`threadpoolctl`; without it, the default is a single worker, and
+        BLAS decides on the number of threads itself.
+    """
+    def __init__(self, n_cores=None, n_workers=None):
+        self.n_cores = _available_cores() if n_cores is None else n_cores
+        self.n_workers = n_workers
+
+    def __repr__(self):
+        return '<Parallelism n_cores=%i, n_workers=%s>' % (self.n_cores, self.n_workers)
+
+    def split(self, n_tasks):
+        """Number of workers and of BLAS threads per worker for ``n_tasks`` parallel tasks
+
+        Returns
+        -------
+        n_workers: int
+        n_threads: int
+        """
+        if self.n_workers is not None:
+            n_workers = self.n_workers
+        elif threadpool_limits is None:
+            n_workers = 1
+        else:
+            n_workers = self.n_cores
+        n_workers = max(1, min(n_workers, n_tasks, self.n_cores))
+        return n_workers, max(1, self.n_cores // n_workers)
+
+    @contextmanager
+    def workers(self, n_tasks):
+        "Context providing a ``map`` over ``n_tasks`` tasks, with BLAS threads limited accordingly"
+        n_workers, n_threads = self.split(n_tasks)
+        with limit_threads(n_threads):
+            if n_workers == 1:
+                yield SERIAL
+            else:
+                with ThreadPoolExecutor(n_workers) as executor:
+                    yield _Workers(executor, n_workers * n_threads)
+
+    def initializer(self, n_workers):
+        """``initializer`` and ``initargs`` for a pool of ``n_workers`` processes
+
+        Every worker process gets an equal share of the core budget.
+        """
+        return _init_worker, (max(1, self.n_cores // n_workers),)
+
+
+def limit_threads(n_threads):
+    "Context limiting BLAS/ OpenMP threads (no effect without :mod:`threadpoolctl`)"
+    if threadpool_limits is None:
+        return nullcontext()
+    return threadpool_limits(limits=n_threads)
+
+
+def _init_worker(n_threads):
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = str(n_threads)
+    if threadpool_limits is not None:
+        threadpool_limits(limits=n_threads)
+    set_parallelism(n_threads)
+
+
+class _Workers:
+
+    def __init__(self, executor, n_threads):
+        self._executor = executor
+        self._n_threads = n_threads
+
+    def map(self, func, *iterables):
+        return list(self._executor.map(func, *iterables))
+
+    def exclusive(self):
+        "Context for work in the calling thread while no tasks run, with the BLAS threads of all workers"
+        return limit_threads(self._n_threads)
+
+
+class _Serial:
+    "Stand-in for :class:`_Workers` running tasks in the calling thread"
+
+    def map(self, func, *iterables):
+        return list(map(func, *iterables))
+
+    def exclusive(self):
+        return nullcontext()
+
+
+SERIAL = _Serial()
+_policy = Parallelism()
+
+
+def get_parallelism():
+    "The current :class:`Parallelism` policy"
+    return _policy
+
+
+def set_parallelism(n_cores=None, n_workers=None):
+    """Set the :class:`Parallelism` policy used by fitting, evaluation and batch processing
+
+    Parameters
+    ----------
+    n_cores: int
+        total number of cores to use (default: all cores available to the process).
+    n_workers: int
+        number of parallel workers (default: one per task, up to ``n_cores``).
+
+    Returns
+    -------
+    Parallelism
+    the previous policy
+    """
+    global _policy
+    previous = _policy
+    _policy = Parallelism(n_cores, n_workers)
+    return previous
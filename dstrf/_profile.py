@@ -0,0 +1,171 @@
+# Author: Proloy Das <proloy@umd.edu>
+"""Instrumentation of the fitting procedure"""
+from collections import defaultdict
+import threading
+import time
+import tracemalloc
+
+
+class FitStats:
+    """Timing, counts and memory allocation for the phases of :meth:`DstRF.fit`
+
+    Parameters
+    ----------
+    memory: bool
+        also record the peak memory allocated in each phase (uses :mod:`tracemalloc`, which
+        slows down allocation-heavy code considerably). Tracing started for this purpose is
+        stopped by :meth:`close`. Since :mod:`tracemalloc` measures the whole process, memory
+        is only attributed to phases entered in the thread that created the stats; phases
+        entered in worker threads are timed and counted only.
+
+    callback: callable, optional
+        called as ``callback(model, stats)`` at the end of every outer iteration.
+
+    Attributes
+    ----------
+    times: dict
+        total time spent in each phase (s)
+
+    counts: dict
+        number of times each phase was entered, plus counters like ``fasta_iterations``,
+        ``backtracks`` and ``f_gram`` (objective evaluations from Gram matrices, for sparse
+        ``theta``)
+
+    peak_bytes: dict
+        largest amount of memory allocated within a single call of each phase
+        (only with ``memory=True``)
+
+    iterations: list of dict
+        the value of ``times`` after each outer iteration
+
+    Notes
+    -----
+    Phases recorded by :meth:`DstRF.fit` are ``construct_f`` (Cholesky factors and whitening),
+    ``fasta`` (the whole inner FASTA solve), ``f`` and ``gradf`` (individual evaluations inside
+    FASTA), ``champagne`` (the whole Champagne step), ``gamma`` (the per-source Gamma kernel)
+    and ``eval_obj`` (objective evaluations for ``verbose`` output).
+    """
+    enabled = True
+
+    def __init__(self, memory=False, callback=None):
+        self.memory = memory
+        self.callback = callback
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.peak_bytes = defaultdict(int)
+        self.iterations = []
+        self._phases = []  # currently open phases, for nesting memory measurements
+        self._thread = threading.get_ident()
+        self._started_tracing = False
+        self._lock = threading.Lock()  # phases run in worker threads, too
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        items = ', '.join('%s: %.3fs' % item for item in self.times.items())
+        return '<FitStats %s>' % items
+
+    def phase(self, name):
+        "Context manager timing a phase"
+        return _Phase(self, name)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    def wrap(self, name, func):
+        "Wrap ``func`` so that every call is recorded as phase ``name``"
+        def wrapper(*args, **kwargs):
+            with _Phase(self, name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def end_iteration(self, model):
+        with self._lock:
+            self.iterations.append(dict(self.times))
+        if self.callback is not None:
+            self.callback(model, self)
+
+    def close(self):
+        "Stop :mod:`tracemalloc` if it was started by these stats"
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _measure_memory(self):
+        return self.memory and threading.get_ident() == self._thread
+
+
+class _Phase:
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        stats = self.stats
+        self.measure = stats._measure_memory()
+        if self.measure:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                stats._started_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            # the enclosing phase's peak is about to be reset
+            for phase in stats._phases:
+                phase.peak = max(phase.peak, peak)
+            tracemalloc.reset_peak()
+            self.memory = self.peak = current
+            stats._phases.append(self)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        stats = self.stats
+        elapsed = time.perf_counter() - self.start
+        with stats._lock:
+            stats.times[self.name] += elapsed
+            stats.counts[self.name] += 1
+        if self.measure:
+            stats._phases.pop()
+            peak = max(self.peak, tracemalloc.get_traced_memory()[1]) - self.memory
+            if peak > stats.peak_bytes[self.name]:
+                stats.peak_bytes[self.name] = peak
+
+
+class _NullStats:
+    "Stand-in for :class:`FitStats` when instrumentation is disabled"
+    enabled = False
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def count(self, name, n=1):
+        pass
+
+    def wrap(self, name, func):
+        return func
+
+    def end_iteration(self, model):
+        pass
+
+    def close(self):
+        pass
+
+
+class _NullPhase:
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+NO_STATS = _NullStats()
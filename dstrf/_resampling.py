@@ -0,0 +1,158 @@
+# Author: Proloy Das <proloy@umd.edu>
+"""Null distributions of TRFs from refitting to permuted or bootstrapped trials"""
+import numpy as np
+
+from ._parallel import SERIAL, get_parallelism
+from ._profile import NO_STATS
+
+
+class Resampler:
+    """Refits a model to resampled trials to obtain null distributions of its TRFs
+
+    Resampled data are assembled from the cached sufficient statistics (bb', bE, E'E) of the
+    trials in ``data``, without reloading or re-lagging the recordings, and every replicate is
+    warm-started from the observed solution. Replicates run in parallel according to the
+    :class:`Parallelism` policy.
+
+    Parameters
+    ----------
+    model: DstRF
+        model fitted to ``data``
+    data: REG_Data
+        the data ``model`` was fitted to
+
+    Notes
+    -----
+    A permutation pairs the MEG data of each trial with the stimulus of another trial, which
+    requires the cross-statistics ``b_i E_j'`` of the two trials; these are computed once per
+    pair, when first needed. Only trials of the same length can be paired.
+    """
+    def __init__(self, model, data):
+        if data._bbt is None:
+            data._precompute()
+        self.model = model
+        self.data = data
+        self._cross_bE = {}
+
+    def _bE(self, meg_trial, stim_trial):
+        if meg_trial == stim_trial:
+            return self.data._bE[meg_trial]
+        pair = (meg_trial, stim_trial)
+        if pair not in self._cross_bE:
+            keys = self.data.datakeys
+            b = self.data.meg[keys[meg_trial]]
+            E = self.data.covariates[keys[stim_trial]]
+            if b.shape[1] != E.shape[0]:
+                raise ValueError("Trials %r and %r have different lengths and can not be paired" %
+                                 (keys[meg_trial], keys[stim_trial]))
+            self._cross_bE[pair] = np.dot(b, E)
+        return self._cross_bE[pair]
+
+    def resampled_data(self, meg_trials, stim_trials):
+        """Data pairing the MEG of trial ``meg_trials[i]`` with the stimulus of ``stim_trials[i]``
+
+        Parameters
+        ----------
+        meg_trials: sequence of int
+            index (into ``data.datakeys``) of the MEG data of each resampled trial
+        stim_trials: sequence of int
+            index of the stimulus of each resampled trial
+
+        Returns
+        -------
+        REG_Data
+        resampled trials with keys ``(i, key)``, where ``key`` is the key of the MEG trial.
+        Only the sufficient statistics are filled in, so the data can not be iterated over.
+        """
+        self.data._refresh()
+        keys = [self.data.datakeys[trial] for trial in meg_trials]
+        return self.data._with_statistics(
+            [(i, key) for i, key in enumerate(keys)],
+            [self.data._bbt[trial] for trial in meg_trials],
+            [self._bE(meg_trial, stim_trial) for meg_trial, stim_trial in zip(meg_trials, stim_trials)],
+            [self.data._EtE[trial] for trial in stim_trials],
+            keys)
+
+    def _fit(self, data, seed, n_iter, tol, strf_kwargs):
+        "Fit to resampled ``data``, warm-started from the observed solution"
+        observed = self.model
+        model = observed.copy()
+        model.mu = observed.mu
+        model.theta = observed.theta.copy()
+        model.keys = data.datakeys.copy()
+        model.Gamma = {}
+        model.Sigma_b = {}
+        for key in model.keys:
+            # the Champagne kernels update (free orientation) Gamma arrays in place
+            model.Gamma[key] = [gamma.copy() if isinstance(gamma, np.ndarray) else gamma
+                                for gamma in observed.Gamma[key[1]]]
+            model.Sigma_b[key] = observed.Sigma_b[key[1]]
+        model.err = []
+        # replicates are the parallel tasks, the trials of each replicate are fit serially
+        model._iterate_trials(data, n_iter, tol, False, 0, None, 1, NO_STATS, SERIAL,
+                              np.random.RandomState(seed))
+        return model.get_strf(data, **strf_kwargs)
+
+    def _run(self, samples, rng, n_iter, tol, strf_kwargs):
+        datasets = [self.resampled_data(meg_trials, stim_trials) for meg_trials, stim_trials in samples]
+        # every replicate has its own random state, so results do not depend on scheduling
+        seeds = rng.randint(2 ** 31, size=len(datasets))
+        with get_parallelism().workers(len(datasets)) as workers:
+            return workers.map(lambda data, seed: self._fit(data, seed, n_iter, tol, strf_kwargs),
+                               datasets, seeds)
+
+    def permutation(self, n_samples=100, n_iter=2, tol=1e-4, seed=0, **strf_kwargs):
+        """Null distribution of the TRFs under random pairings of MEG data and stimuli
+
+        Parameters
+        ----------
+        n_samples: int
+            number of permutations
+        n_iter: int
+            outer iterations for each replicate (starting from the observed solution)
+        tol: float
+            tolerance for stopping the outer iterations
+        seed: int
+            seed for the random permutations and the fits
+        ...
+            additional parameters for :meth:`DstRF.get_strf`
+
+        Returns
+        -------
+        list
+        one :meth:`DstRF.get_strf` result per permutation
+        """
+        rng = np.random.RandomState(seed)
+        n_trials = len(self.data)
+        meg_trials = np.arange(n_trials)
+        samples = [(meg_trials, rng.permutation(n_trials)) for _ in range(n_samples)]
+        return self._run(samples, rng, n_iter, tol, strf_kwargs)
+
+    def bootstrap(self, n_samples=100, n_iter=2, tol=1e-4, seed=0, **strf_kwargs):
+        """Bootstrap distribution of the TRFs from resampling trials with replacement
+
+        Parameters
+        ----------
+        n_samples: int
+            number of bootstrap samples
+        n_iter: int
+            outer iterations for each replicate (starting from the observed solution)
+        tol: float
+            tolerance for stopping the outer iterations
+        seed: int
+            seed for drawing the samples and for the fits
+        ...
+            additional parameters for :meth:`DstRF.get_strf`
+
+        Returns
+        -------
+        list
+        one :meth:`DstRF.get_strf` result per bootstrap sample
+        """
+        rng = np.random.RandomState(seed)
+        n_trials = len(self.data)
+        samples = []
+        for _ in range(n_samples):
+            trials = rng.randint(0, n_trials, n_trials)
+            samples.append((trials, trials))
+        return self._run(samples, rng, n_iter, tol, strf_kwargs)
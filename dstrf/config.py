@@ -15,11 +15,15 @@ predictor_template = 'predictors/stim_%s.pickled'
 fwdsol_template = 'fwdsol/%s-vol-7-fwd.pickled'
 emptyroom_template = 'meg_XXXX/emptyroom.pickled'
 
+# output file-name templates (subject, mu)
+trf_template = 'trfs/%s-mu-%s-trf.pickled'
+
 
 meg_file = join(ROOTDIR, meg_template)
 predictor_file = join(ROOTDIR, predictor_template)
 fwdsol_file = join(ROOTDIR, fwdsol_template)
 emptyroom_file = join(ROOTDIR, emptyroom_template)
+trf_file = join(ROOTDIR, trf_template)
 
 # Cut-off frequencies for band-pass filter
 l_freq = 1
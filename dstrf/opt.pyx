@@ -2,9 +2,12 @@
 # Author: Proloy Das <proloy@umd.edu>
 #cython: boundscheck=False, wraparound=False
 # cython: profile=False
+# distutils: extra_compile_args = -fopenmp
+# distutils: extra_link_args = -fopenmp
 
 cimport cython
-from libc.math cimport sqrt
+from cython.parallel import prange
+from libc.math cimport sqrt, fabs
 import numpy as np
 cimport numpy as cnp
 from dsyevh3C import eig3
@@ -49,6 +52,85 @@ def cproxg_group(cnp.ndarray[FLOAT64, ndim=3] y,
     return out
 
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def cproxg_group_inplace(FLOAT64[:, :, ::1] y, double mu):
+    """Group soft thresholding in place, parallel over voxels
+
+    Parameters
+    ----------
+    y: ndarray
+        array of shape (n_voxels, 3, n_times), overwritten with the result
+    mu: float
+        threshold
+
+    Returns
+    -------
+    float
+    sum of the group norms of the result
+    """
+    cdef Py_ssize_t i, j
+    cdef double norm, mul
+    cdef double penalty = 0
+
+    cdef Py_ssize_t n_voxels = y.shape[0]
+    cdef Py_ssize_t n_times = y.shape[2]
+
+    for i in prange(n_voxels, nogil=True, schedule='static'):
+        for j in range(n_times):
+            norm = sqrt(y[i, 0, j] * y[i, 0, j] + y[i, 1, j] * y[i, 1, j] + y[i, 2, j] * y[i, 2, j])
+            if norm > mu:
+                mul = 1 - mu / norm
+                penalty += norm - mu
+            else:
+                mul = 0
+            y[i, 0, j] = mul * y[i, 0, j]
+            y[i, 1, j] = mul * y[i, 1, j]
+            y[i, 2, j] = mul * y[i, 2, j]
+
+    return penalty
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def cshrink_inplace(FLOAT64[:, ::1] x, double mu):
+    """Soft thresholding in place, parallel over rows
+
+    Parameters
+    ----------
+    x: ndarray
+        array of shape (n_sources, n_times), overwritten with the result
+    mu: float
+        threshold
+
+    Returns
+    -------
+    float
+    l1-norm of the result
+    """
+    cdef Py_ssize_t i, j
+    cdef double a
+    cdef double penalty = 0
+
+    cdef Py_ssize_t n_sources = x.shape[0]
+    cdef Py_ssize_t n_times = x.shape[1]
+
+    for i in prange(n_sources, nogil=True, schedule='static'):
+        for j in range(n_times):
+            a = fabs(x[i, j]) - mu
+            if a > 0:
+                penalty += a
+                if x[i, j] > 0:
+                    x[i, j] = a
+                else:
+                    x[i, j] = -a
+            else:
+                x[i, j] = 0
+
+    return penalty
+
+
 cdef int mm(FLOAT64[:,:] a, FLOAT64[:,:] b,
             FLOAT64[:,:] c):
     cdef Py_ssize_t i, j, k
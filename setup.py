@@ -14,8 +14,10 @@ else:
     actual_paths = []
     for path in ext_paths:
         actual_paths.extend(glob(path % '.c'))
+    # opt.pyx declares these as distutils directives, which only cythonize reads
+    openmp = {'extra_compile_args': ['-fopenmp'], 'extra_link_args': ['-fopenmp']}
     ext_modules = [
-        Extension(path.replace(pathsep, '.')[:-2], [path])
+        Extension(path.replace(pathsep, '.')[:-2], [path], **(openmp if path.endswith('opt.c') else {}))
         for path in actual_paths
     ]
 
@@ -24,13 +26,17 @@ setup(
     description="MEG/EEG analysis tools",
     version="0.1",
     packages=find_packages(),
-    python_requires='>=3.0',
+    python_requires='>=3.7',
 
     install_requires=[
         'numpy',
         'scipy',
         'eelbrain',
     ],
+    extras_require={
+        # limit BLAS threads when splitting cores between workers (dstrf.Parallelism)
+        'parallel': ['threadpoolctl'],
+    },
 
 
     # metadata for upload to PyPI
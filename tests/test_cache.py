@@ -0,0 +1,41 @@
+# Author: Proloy Das <proloy@umd.edu>
+import numpy as np
+
+from dstrf import DstRF, FitCache
+from benchmarks.synthetic import make_lead_field, make_theta, make_data
+
+FILTER_LENGTH = 20
+
+
+def test_fit_cache(tmp_path):
+    "Identical fits are restored from the cache, changed ones are fitted"
+    lead_field = make_lead_field(10, 20)
+    theta = make_theta(20, FILTER_LENGTH - 1)
+    data, _ = make_data(lead_field, theta, 2, 300, FILTER_LENGTH)
+    other_data, _ = make_data(lead_field, theta, 2, 300, FILTER_LENGTH, seed=1)
+    cache = FitCache(path=str(tmp_path))
+
+    def fit(data, mu):
+        np.random.seed(0)
+        model = DstRF(lead_field, np.eye(10), n_iter=2, n_iterc=3, n_iterf=10)
+        return model.fit(data, mu, cache=cache)
+
+    model = fit(data, 0.01)
+    assert (cache.hits, cache.misses) == (0, 1)
+    cached = fit(data, 0.01)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert np.array_equal(cached.theta, model.theta)
+    assert cached.err == model.err
+    for key in model.keys:
+        assert np.array_equal(cached.Sigma_b[key], model.Sigma_b[key])
+
+    # changed mu or data
+    assert not np.array_equal(fit(data, 0.02).theta, model.theta)
+    assert (cache.hits, cache.misses) == (1, 2)
+    fit(other_data, 0.01)
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    # persistent cache
+    cache = FitCache(path=str(tmp_path))
+    assert np.array_equal(fit(data, 0.01).theta, model.theta)
+    assert (cache.hits, cache.misses) == (1, 0)
@@ -0,0 +1,86 @@
+# Author: Proloy Das <proloy@umd.edu>
+import numpy as np
+from numpy.testing import assert_allclose
+
+from dstrf import DstRF, REG_Data
+from benchmarks.synthetic import make_lead_field, make_theta, make_data
+
+FILTER_LENGTH = 20
+
+
+def make_trials(n_times=600, n_trials=2):
+    lead_field = make_lead_field(10, 20)
+    theta = make_theta(20, FILTER_LENGTH - 1)
+    data, trials = make_data(lead_field, theta, n_trials, n_times, FILTER_LENGTH)
+    return lead_field, data, trials
+
+
+def test_append():
+    "Trials loaded in pieces with append are equivalent to trials loaded at once"
+    lead_field, data, trials = make_trials()
+    appended = REG_Data(FILTER_LENGTH)
+    for key, meg, stim in trials:
+        appended.load(key, meg.x[:, :300], stim.x[:300], tstep=meg.time.tstep)
+        appended.append(key, meg.x[:, 300:], stim.x[300:])
+
+    for (b, E, key), (b_, E_, key_) in zip(data, appended):
+        assert key == key_
+        assert_allclose(b_, b)
+        assert_allclose(E_, E)
+
+    idx = np.arange(400)
+    sliced = data.timeslice(idx)
+    sliced_ = appended.timeslice(idx)
+    for key in data.datakeys:
+        assert_allclose(sliced_.meg[key], sliced.meg[key])
+        assert_allclose(sliced_.covariates[key], sliced.covariates[key])
+
+    appended.memory_limit = 1000
+    statistics = appended._timeslice_statistics(idx)
+    statistics._precompute()
+    sliced._precompute()
+    for a, b in ((statistics._bbt, sliced._bbt), (statistics._bE, sliced._bE),
+                 (statistics._EtE, sliced._EtE)):
+        assert_allclose(a, b)
+
+    thetas = []
+    for regdata in (data, appended):
+        np.random.seed(0)
+        model = DstRF(lead_field, np.eye(10), n_iter=2, n_iterc=3, n_iterf=10)
+        model.fit(regdata, 0.01, idx=idx)
+        thetas.append(model.theta)
+    assert_allclose(thetas[1], thetas[0], atol=1e-10)
+
+
+def test_fft_statistics():
+    "Sufficient statistics from FFTs equal the products of the covariate matrices"
+    lead_field = make_lead_field(10, 20)
+    for n_predictors in (1, 2):
+        theta = make_theta(20, FILTER_LENGTH - 1, n_predictors=n_predictors)
+        data, trials = make_data(lead_field, theta, 2, 600, FILTER_LENGTH, n_predictors)
+        fft_data = REG_Data(FILTER_LENGTH, statistics='fft')
+        for key, meg, stim in trials:
+            fft_data.load(key, meg, stim)
+        data._precompute()
+        fft_data._precompute()
+        for attr in ('_bbt', '_bE', '_EtE'):
+            for direct, fft in zip(getattr(data, attr), getattr(fft_data, attr)):
+                assert_allclose(fft, direct, rtol=0, atol=1e-13 * np.abs(direct).max())
+        # covariates are formed on demand
+        for key in data.datakeys:
+            assert_allclose(fft_data.covariates[key], data.covariates[key], rtol=0, atol=1e-13)
+
+
+def test_with_statistics():
+    "Instances holding only statistics, with new trial keys"
+    _, data, trials = make_trials()
+    data._precompute()
+    keys = [(i, key) for i, key in enumerate(data.datakeys[::-1])]
+    sources = data.datakeys[::-1]
+    statistics = data._with_statistics(keys, data._bbt[::-1], data._bE[::-1], data._EtE[::-1],
+                                       sources)
+    assert statistics.datakeys == keys
+    for key, source in zip(keys, sources):
+        assert statistics._norm_factors[key] == data._norm_factors[source]
+    statistics._precompute()  # keeps the given statistics
+    assert all(a is b for a, b in zip(statistics._EtE, data._EtE[::-1]))
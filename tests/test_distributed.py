@@ -0,0 +1,88 @@
+# Author: Proloy Das <proloy@umd.edu>
+from functools import partial
+import os
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from dstrf import DstRF, REG_Data, local_workers
+from benchmarks.synthetic import make_lead_field, make_theta, make_data
+
+FILTER_LENGTH = 20
+
+
+def load_trials(trials):
+    data = REG_Data(FILTER_LENGTH)
+    for key, meg, stim in trials:
+        data.load(key, meg, stim)
+    return data
+
+
+def test_fit_distributed():
+    "Distributed fits equal local fits"
+    lead_field = make_lead_field(10, 20)
+    theta = make_theta(20, FILTER_LENGTH - 1)
+    data, trials = make_data(lead_field, theta, 3, 300, FILTER_LENGTH)
+    kwargs = dict(n_iter=3, n_iterc=3, n_iterf=10)
+
+    np.random.seed(0)
+    model = DstRF(lead_field, np.eye(10), **kwargs).fit(data, 0.01)
+
+    connections = local_workers(2)
+    try:
+        np.random.seed(0)
+        distributed = DstRF(lead_field, np.eye(10), **kwargs)
+        distributed.fit_distributed(data, 0.01, connections)
+        assert distributed.keys == model.keys
+        assert_allclose(distributed.theta, model.theta, atol=1e-12)
+        for key in model.keys:
+            assert_allclose(distributed.Sigma_b[key], model.Sigma_b[key], atol=1e-12)
+
+        # workers loading their own trials
+        shards = [partial(load_trials, trials[:2]), partial(load_trials, trials[2:])]
+        np.random.seed(0)
+        loaded = DstRF(lead_field, np.eye(10), **kwargs)
+        loaded.fit_distributed(shards, 0.01, connections)
+        assert loaded.keys == model.keys
+        assert_allclose(loaded.theta, model.theta, atol=1e-12)
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+class Forwarder:
+    "Connection to a worker that is not known to run on this machine"
+    def __init__(self, connection):
+        self.connection = connection
+
+    def send(self, obj):
+        self.connection.send(obj)
+
+    def recv(self):
+        return self.connection.recv()
+
+    def close(self):
+        self.connection.close()
+
+
+def test_fit_distributed_shared_lead_field(tmp_path):
+    "Workers that may be on other machines receive the contents of a shared lead-field"
+    lead_field = make_lead_field(10, 20)
+    theta = make_theta(20, FILTER_LENGTH - 1)
+    data, _ = make_data(lead_field, theta, 2, 300, FILTER_LENGTH)
+    kwargs = dict(n_iter=2, n_iterc=3, n_iterf=10)
+    np.random.seed(0)
+    model = DstRF(lead_field, np.eye(10), **kwargs).fit(data, 0.01)
+
+    shared = DstRF(lead_field, np.eye(10), **kwargs)
+    path = str(tmp_path / 'lead_field.npy')
+    shared.share_lead_field(path)
+    os.remove(path)  # only the coordinator can still access the mapped data
+    connections = [Forwarder(connection) for connection in local_workers(2)]
+    try:
+        np.random.seed(0)
+        shared.fit_distributed(data, 0.01, connections)
+    finally:
+        for connection in connections:
+            connection.close()
+    assert_allclose(shared.theta, model.theta, atol=1e-12)
@@ -0,0 +1,18 @@
+# Author: Proloy Das <proloy@umd.edu>
+from benchmarks.__main__ import IMPORT_BUDGET, measure_import
+
+
+def test_import():
+    "import dstrf is fast and does not import eelbrain, mne or matplotlib"
+    import_time, heavy_modules = measure_import()
+    assert heavy_modules == []
+    assert import_time < IMPORT_BUDGET
+
+
+def test_all():
+    "Every name in dstrf.__all__ can be imported"
+    import dstrf
+
+    namespace = {}
+    exec('from dstrf import *', namespace)
+    assert set(dstrf.__all__) <= set(namespace)
@@ -0,0 +1,252 @@
+# Author: Proloy Das <proloy@umd.edu>
+import warnings
+
+import numpy as np
+from numpy.testing import assert_allclose
+import pytest
+
+from dstrf import DstRF, FitStats, REG_Data, Resampler, gaussian_basis, svd_basis
+from dstrf._model import _closed_form_gamma, _compute_gamma_i, _compute_gamma_ip
+from benchmarks.synthetic import make_lead_field, make_theta, make_data
+
+FILTER_LENGTH = 20
+
+
+def test_get_strf_no_active_sources():
+    "get_strf with active_only when all TRFs are zero"
+    for orientation in ('fixed', 'free'):
+        lead_field = make_lead_field(10, 20, orientation)
+        theta = make_theta(20, FILTER_LENGTH - 1, orientation, n_predictors=2)
+        data, _ = make_data(lead_field, theta, 1, 300, FILTER_LENGTH, n_predictors=2)
+        model = DstRF(lead_field, np.eye(10))
+        model.theta = np.zeros_like(theta)
+        trf = model.get_strf(data, active_only=True)
+        assert len(trf.source) == 0
+        assert trf.x.size == 0
+        model.source = None
+        index, trf = model.get_strf(data, active_only=True, expand=False)
+        assert len(index) == 0
+        assert trf.size == 0
+
+
+def test_resume(tmp_path):
+    "A fit resumed from a checkpoint is identical to an uninterrupted fit"
+    for orientation in ('fixed', 'free'):
+        lead_field = make_lead_field(10, 20, orientation)
+        theta = make_theta(20, FILTER_LENGTH - 1, orientation)
+        data, _ = make_data(lead_field, theta, 2, 300, FILTER_LENGTH)
+        checkpoint = str(tmp_path / orientation)
+
+        np.random.seed(1)
+        model = DstRF(lead_field, np.eye(10), n_iter=4, n_iterc=3, n_iterf=10)
+        model.fit(data, 0.01, tol=0)
+
+        np.random.seed(1)
+        interrupted = DstRF(lead_field, np.eye(10), n_iter=2, n_iterc=3, n_iterf=10)
+        interrupted.fit(data, 0.01, tol=0, checkpoint=checkpoint)
+        np.random.seed(2)
+        resumed = DstRF(lead_field, np.eye(10), n_iter=4, n_iterc=3, n_iterf=10)
+        resumed.fit(data, 0.01, tol=0, checkpoint=checkpoint, resume=True)
+
+        assert model.theta.any()
+        assert np.array_equal(resumed.theta, model.theta)
+        assert resumed.err == model.err
+        for key in model.keys:
+            assert np.array_equal(resumed.Sigma_b[key], model.Sigma_b[key])
+
+
+def test_resampler():
+    "Permutation and bootstrap replicates"
+    for orientation in ('fixed', 'free'):
+        lead_field = make_lead_field(10, 20, orientation)
+        theta = make_theta(20, FILTER_LENGTH - 1, orientation)
+        data, _ = make_data(lead_field, theta, 3, 300, FILTER_LENGTH)
+        np.random.seed(0)
+        model = DstRF(lead_field, np.eye(10), n_iter=2, n_iterc=3, n_iterf=10)
+        model.fit(data, 0.01)
+        strf = model.get_strf(data)
+        resampler = Resampler(model, data)
+        for method in (resampler.permutation, resampler.bootstrap):
+            replicates = method(n_samples=3, n_iter=1)
+            assert len(replicates) == 3
+            for replicate in replicates:
+                assert replicate.dims == strf.dims
+                assert np.isfinite(replicate.x).all()
+
+
+def test_memory_limit():
+    "Memory limits that can not be met are reported"
+    lead_field = make_lead_field(10, 20)
+    theta = make_theta(20, FILTER_LENGTH - 1)
+    data, _ = make_data(lead_field, theta, 2, 300, FILTER_LENGTH)
+    model = DstRF(lead_field, np.eye(10), n_iter=1, n_iterc=3, n_iterf=10, memory_limit=1)
+    with pytest.warns(RuntimeWarning, match='memory_limit'):
+        model.fit(data, 0.01)
+    assert model.memory_['streamed']
+    model.memory_limit = model.estimate_memory(data, True)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        model._plan_memory(data)
+
+
+def test_save_load(tmp_path):
+    "A saved and loaded model equals the original, with and without memory-mapping"
+    for orientation in ('fixed', 'free'):
+        lead_field = make_lead_field(10, 20, orientation)
+        theta = make_theta(20, FILTER_LENGTH - 1, orientation)
+        data, _ = make_data(lead_field, theta, 2, 300, FILTER_LENGTH)
+        np.random.seed(0)
+        model = DstRF(lead_field, np.eye(10), n_iter=2, n_iterc=3, n_iterf=10)
+        model.fit(data, 0.01)
+        path = str(tmp_path / orientation)
+        model.save(path)
+        strf = model.get_strf(data)
+
+        for mmap_mode in (None, 'r'):
+            loaded = DstRF.load(path, mmap_mode)
+            assert isinstance(loaded.theta, np.memmap) == (mmap_mode is not None)
+            for attr in ('theta', 'lead_field', 'noise_covariance', 'init_sigma_b'):
+                assert np.array_equal(getattr(loaded, attr), getattr(model, attr))
+            for attr in ('mu', 'keys', 'err', 'orientation', 'sources_n', 'eta'):
+                assert getattr(loaded, attr) == getattr(model, attr)
+            for key in model.keys:
+                assert np.array_equal(loaded.Sigma_b[key], model.Sigma_b[key])
+                assert np.array_equal(np.reshape(loaded.Gamma[key], -1),
+                                      np.reshape(model.Gamma[key], -1))
+            loaded_strf = loaded.get_strf(data)
+            assert loaded_strf.dims == strf.dims
+            assert np.array_equal(loaded_strf.x, strf.x)
+
+
+def test_evaluate_models():
+    "evaluate_models equals compute_ES_metric, eval_cv and eval_cv1"
+    lead_field = make_lead_field(10, 20)
+    theta = make_theta(20, FILTER_LENGTH - 1)
+    data, _ = make_data(lead_field, theta, 3, 300, FILTER_LENGTH)
+    models = []
+    for mu in (0.005, 0.01, 0.02):
+        np.random.seed(0)
+        models.append(DstRF(lead_field, np.eye(10), n_iter=2, n_iterc=3, n_iterf=10).fit(data, mu))
+    out = DstRF.evaluate_models(models, data)
+    assert np.isfinite(out['es']) and out['es'] > 0
+    assert_allclose(out['es'], DstRF.compute_ES_metric(models, data), rtol=1e-12)
+    assert_allclose(out['cv'], [model.eval_cv(data) for model in models], rtol=1e-12)
+    assert_allclose(out['cv1'], [model.eval_cv1(data) for model in models], rtol=1e-12)
+    assert DstRF.evaluate_models(models, data, cv=False).keys() == {'es'}
+
+
+def test_basis():
+    "Fits with a custom basis"
+    lead_field = make_lead_field(10, 20)
+    theta = make_theta(20, FILTER_LENGTH - 1)
+    data, trials = make_data(lead_field, theta, 2, 300, FILTER_LENGTH)
+    x = np.linspace(5, 1000, FILTER_LENGTH)
+
+    def fit(basis):
+        regdata = REG_Data(FILTER_LENGTH, basis=basis)
+        for trial in trials:
+            regdata.load(*trial)
+        np.random.seed(0)
+        model = DstRF(lead_field, np.eye(10), n_iter=2, n_iterc=3, n_iterf=10)
+        return model.fit(regdata, 0.01), regdata
+
+    np.random.seed(0)
+    model = DstRF(lead_field, np.eye(10), n_iter=2, n_iterc=3, n_iterf=10).fit(data, 0.01)
+    explicit, _ = fit(gaussian_basis(FILTER_LENGTH, x))
+    assert np.array_equal(explicit.theta, model.theta)
+
+    for basis in (gaussian_basis(FILTER_LENGTH, x, n_atoms=5, std=40),
+                  svd_basis(data.basis, 5)):
+        small, regdata = fit(basis)
+        assert small.theta.shape == (20, 5)
+        strf = small.get_strf(regdata)
+        assert strf.x.shape == (20, FILTER_LENGTH)
+        assert_allclose(strf.x, np.dot(small.theta, basis.T))
+        assert small.get_strf(regdata, expand=False).x.shape == (20, 5)
+
+    with pytest.raises(ValueError):
+        REG_Data(FILTER_LENGTH, basis=np.ones((FILTER_LENGTH - 1, 5)))
+
+
+def test_closed_form_gamma():
+    "Diagonal and scalar Champagne updates equal the full update where it is diagonal or scalar"
+    n_sources, n_sensors = 4, 15
+    rng = np.random.RandomState(0)
+    q, _ = np.linalg.qr(rng.randn(n_sensors, n_sensors))
+    for scalar in (False, True):
+        # orthogonal lead-field columns and a residual with the same eigenvectors make every
+        # Z_i and X_i X_i' diagonal, and with equal scales per source, multiples of I
+        scales = rng.uniform(0.5, 2, (n_sources, 1 if scalar else 3))
+        scales = np.broadcast_to(scales, (n_sources, 3)).ravel()
+        lhat = q[:, :3 * n_sources] * scales
+        d = rng.uniform(0.5, 2, (n_sources, 1 if scalar else 3))
+        d = np.concatenate((np.broadcast_to(d, (n_sources, 3)).ravel(), np.ones(n_sensors - 3 * n_sources)))
+        ytilde = np.dot(q * d, q.T)
+        gamma = rng.uniform(0.5, 2, (n_sources, 1 if scalar else 3))
+        gamma = np.broadcast_to(gamma, (n_sources, 3)).ravel()
+
+        closed_form = _closed_form_gamma(gamma, ytilde, lhat, 3, scalar).reshape((n_sources, 3))
+        for i in range(n_sources):
+            columns = slice(3 * i, 3 * i + 3)
+            x = np.dot(np.diag(gamma[columns]), np.dot(ytilde.T, lhat[:, columns]).T)
+            z = np.dot(lhat[:, columns].T, lhat[:, columns])
+            assert_allclose(_compute_gamma_i(z, x), np.diag(closed_form[i]), atol=1e-12)
+            gamma_i = np.diag(gamma[columns])
+            _compute_gamma_ip(z, x, gamma_i)
+            assert_allclose(gamma_i, np.diag(closed_form[i]), atol=1e-12)
+
+
+def fitted_objective(orientation_):
+    "Fitted model with the objective, the gradient and their per-trial reference computation"
+    lead_field = make_lead_field(10, 20, orientation_)
+    theta = make_theta(20, FILTER_LENGTH - 1, orientation_)
+    data, _ = make_data(lead_field, theta, 3, 300, FILTER_LENGTH)
+    np.random.seed(0)
+    model = DstRF(lead_field, np.eye(10), n_iter=2, n_iterc=3, n_iterf=10)
+    model.fit(data, 0.01)
+
+    def f_and_gradf(x):
+        f = 0
+        grad = np.zeros_like(x)
+        for meg, covariates, key in data:
+            sigma_b_inv = np.linalg.inv(model.Sigma_b[key])
+            y = meg - np.dot(np.dot(model.lead_field, x), covariates.T)
+            f += 0.5 * np.vdot(y, np.dot(sigma_b_inv, y))
+            grad -= np.dot(np.dot(model.lead_field.T, np.dot(sigma_b_inv, y)), covariates)
+        return f, grad
+
+    return model, data, f_and_gradf
+
+
+def test_objective():
+    "Objective and gradient with stacked trials equal the per-trial computation"
+    rng = np.random.RandomState(0)
+    for orientation_ in ('fixed', 'free'):
+        model, data, f_and_gradf = fitted_objective(orientation_)
+        for streaming in (False, True):
+            model._streaming = streaming
+            funct, grad_funct = model._construct_f(data)
+            for _ in range(2):
+                x = rng.randn(*model.theta.shape)
+                f, grad = f_and_gradf(x)
+                assert_allclose(funct(x), f, rtol=1e-10)
+                assert_allclose(grad_funct(x), grad, rtol=1e-10, atol=1e-10 * np.abs(grad).max())
+
+
+def test_objective_gram():
+    "The objective of sparse theta is evaluated from Gram matrices"
+    rng = np.random.RandomState(0)
+    for orientation_, dc in (('fixed', 1), ('free', 3)):
+        model, data, f_and_gradf = fitted_objective(orientation_)
+        stats = FitStats()
+        funct, _ = model._construct_f(data, stats)
+        # growing and changing supports, at most as many rows as sensors
+        for sources in ([3], [3, 7], [1, 7, 12], [12]):
+            x = np.zeros(model.theta.shape)
+            for source in sources[:10 // dc]:
+                x[source * dc:(source + 1) * dc] = rng.randn(dc, x.shape[1])
+            assert_allclose(funct(x), f_and_gradf(x)[0], rtol=1e-10)
+        assert stats.counts['f_gram'] == 4
+        funct(rng.randn(*model.theta.shape))
+        assert stats.counts['f'] == 5
+        assert stats.counts['f_gram'] == 4
@@ -0,0 +1,25 @@
+# Author: Proloy Das <proloy@umd.edu>
+from concurrent.futures import ThreadPoolExecutor
+import pickle
+import tracemalloc
+
+from dstrf import FitStats
+
+
+def test_threads():
+    "Phases and counts from worker threads are all recorded"
+    stats = FitStats(memory=True)
+    func = stats.wrap('gamma', lambda i: stats.count('calls'))
+    with stats.phase('champagne'):
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(func, range(2000)))
+    stats.close()
+    assert stats.counts['gamma'] == 2000
+    assert stats.counts['calls'] == 2000
+    assert stats.counts['champagne'] == 1
+    # only the thread owning the stats measures memory
+    assert set(stats.peak_bytes) == {'champagne'}
+    assert not tracemalloc.is_tracing()
+    stats = pickle.loads(pickle.dumps(stats))
+    stats.count('calls')
+    assert stats.counts['calls'] == 2001